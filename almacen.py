@@ -0,0 +1,240 @@
+import os
+import glob
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import geopandas as gpd
+
+import topologia
+
+# ==========================================
+# ALMACENAMIENTO INTERCAMBIABLE (ARCHIVOS / DUCKDB + PARQUET)
+# ==========================================
+# El tablero y los scripts piden datos a un "almacén" en vez de leer archivos
+# directamente. Con SITS_ALMACEN=duckdb los datos viven en Parquet particionado
+# por entidad/municipio: los filtros y las sumas se resuelven como consultas y
+# solo se traen las geometrías de la zona seleccionada. Las vistas que abarcan
+# todo el municipio (mapa, STRtree, puntos calientes) sí lo cargan completo, pero
+# solo la partición configurada (SITS_ENTIDAD/SITS_MUNICIPIO), nunca el almacén.
+
+TODO_MUNICIPIO = "TODO EL MUNICIPIO"
+TODAS_AGEB = "TODAS"
+
+RAIZ_PARQUET = os.environ.get("SITS_PARQUET", "almacen_parquet")
+ENTIDAD = os.environ.get("SITS_ENTIDAD", "30")
+MUNICIPIO = os.environ.get("SITS_MUNICIPIO", "032")
+PARTICIONES = ['CVE_ENT', 'CVE_MUN']
+
+CAPAS = {"urbano": "sits_urbano_oficial.geojson", "rural": "sits_rural_oficial.geojson"}
+TIPOS = {"urbano": "Urbano", "rural": "Rural"}
+TAMANO_LOTE = 5000  # Filas por lote al recorrer selecciones grandes (exportación)
+
+
+def _clave_suma(c):
+    return c if isinstance(c, str) else "*".join(c)
+
+
+class AlmacenArchivos:
+    """Capas completas en memoria (TopoJSON/GeoJSON). Es el comportamiento original."""
+
+    def __init__(self, capas=CAPAS):
+        self.capas = {}
+        for nombre, ruta in capas.items():
+            if os.path.exists(ruta) or os.path.exists(topologia.ruta_topojson(ruta)):
+                gdf = topologia.leer_capa(ruta)
+                gdf['TIPO'] = TIPOS[nombre]
+                self.capas[nombre] = gdf
+
+    def disponible(self):
+        return all(n in self.capas for n in CAPAS)
+
+    def localidades(self):
+        return sorted(set().union(*[set(g['NOM_LOC'].unique()) for g in self.capas.values()]))
+
+    def agebs(self, sel_loc):
+        u = self.capas["urbano"]
+        if sel_loc != TODO_MUNICIPIO: u = u[u['NOM_LOC'] == sel_loc]
+        return sorted(u['CVE_AGEB'].unique())
+
+    def seleccion(self, sel_loc, sel_ageb, geometria=True):
+        """(urbano, rural) de la zona. El AGEB solo filtra la capa urbana."""
+        du, dr = self.capas["urbano"], self.capas["rural"]
+        if sel_loc != TODO_MUNICIPIO:
+            du = du[du['NOM_LOC'] == sel_loc]
+            dr = dr[dr['NOM_LOC'] == sel_loc]
+        if sel_ageb != TODAS_AGEB:
+            du = du[du['CVE_AGEB'] == sel_ageb]
+        if not geometria:
+            return pd.DataFrame(du.drop(columns='geometry')), pd.DataFrame(dr.drop(columns='geometry'))
+        return du.copy(), dr.copy()
+
+    def lotes(self, capa, sel_loc, sel_ageb, claves=None, tamano=TAMANO_LOTE):
+        """
+        GeoDataFrames de a lo más 'tamano' filas de la zona (o solo de las CVEGEO
+        en 'claves'). Cada lote es un corte de la capa en memoria, sin copiarla.
+        """
+        gdf = self.capas[capa]
+        m = np.ones(len(gdf), dtype=bool)
+        if sel_loc != TODO_MUNICIPIO: m &= (gdf['NOM_LOC'] == sel_loc).to_numpy()
+        if capa == "urbano" and sel_ageb != TODAS_AGEB: m &= (gdf['CVE_AGEB'] == sel_ageb).to_numpy()
+        if claves is not None: m &= gdf['CVEGEO'].isin(claves).to_numpy()
+        filas = np.flatnonzero(m)
+        for i in range(0, len(filas), tamano):
+            yield gdf.iloc[filas[i:i + tamano]]
+
+    def esquema(self, capa):
+        """Tipos Arrow de los atributos (sin geometría) inferidos con la capa completa, no con un lote."""
+        gdf = self.capas[capa]
+        return pa.Schema.from_pandas(pd.DataFrame(gdf.drop(columns=gdf.geometry.name)), preserve_index=False)
+
+    def agregados(self, sel_loc, sel_ageb, sumas=(), productos=()):
+        """
+        Sumas de la zona: {col: Σcol} y {'a*b': Σa·b}. Las columnas que no
+        existen cuentan como 0 (mismo blindaje que app.py).
+        """
+        df = pd.concat(self.seleccion(sel_loc, sel_ageb, geometria=False))
+        num = lambda c: pd.to_numeric(df[c], errors='coerce').fillna(0) if c in df.columns else 0
+        res = {c: float(pd.Series(num(c)).sum()) for c in sumas}
+        for a, b in productos:
+            res[_clave_suma((a, b))] = float(pd.Series(num(a) * num(b)).sum())
+        return res
+
+
+class AlmacenDuckDB:
+    """Parquet particionado (CVE_ENT/CVE_MUN) consultado con DuckDB sin cargarlo completo."""
+
+    def __init__(self, raiz=RAIZ_PARQUET, entidad=ENTIDAD, municipio=MUNICIPIO):
+        import duckdb
+        self.con = duckdb.connect()
+        # Sin caché de archivos externos: guardaría en RAM cada Parquet leído y
+        # una exportación estatal terminaría con todo el estado en memoria
+        self.con.execute("SET enable_external_file_cache = false")
+        self.raiz, self.entidad, self.municipio = raiz, entidad, municipio
+        self.columnas = {n: set(self._consulta(f"SELECT * FROM {self._fuente(n)} LIMIT 0").columns) for n in CAPAS if self._existe(n)}
+
+    def _existe(self, capa):
+        return bool(glob.glob(os.path.join(self.raiz, capa, "**", "*.parquet"), recursive=True))
+
+    def _fuente(self, capa):
+        ruta = os.path.join(self.raiz, capa, "**", "*.parquet").replace("'", "''")
+        return f"read_parquet('{ruta}', hive_partitioning=true, hive_types_autocast=false, union_by_name=true)"
+
+    def _consulta(self, sql, params=None):
+        # Un cursor por consulta: las sesiones de Streamlit corren en hilos distintos
+        return self.con.cursor().execute(sql, params or []).df()
+
+    def _filtro(self, capa, sel_loc, sel_ageb):
+        cond, params = [], []
+        if self.entidad: cond.append("CVE_ENT = ?"); params.append(self.entidad)
+        if self.municipio: cond.append("CVE_MUN = ?"); params.append(self.municipio)
+        if sel_loc != TODO_MUNICIPIO: cond.append("NOM_LOC = ?"); params.append(sel_loc)
+        if capa == "urbano" and sel_ageb != TODAS_AGEB: cond.append("CVE_AGEB = ?"); params.append(sel_ageb)
+        return (" WHERE " + " AND ".join(cond)) if cond else "", params
+
+    def disponible(self):
+        return all(n in self.columnas for n in CAPAS)
+
+    def localidades(self):
+        partes, params = [], []
+        for capa in CAPAS:
+            w, p = self._filtro(capa, TODO_MUNICIPIO, TODAS_AGEB)
+            partes.append(f"SELECT DISTINCT NOM_LOC FROM {self._fuente(capa)}{w}")
+            params += p
+        return sorted(self._consulta(" UNION ".join(partes), params)['NOM_LOC'].dropna())
+
+    def agebs(self, sel_loc):
+        w, p = self._filtro("urbano", sel_loc, TODAS_AGEB)
+        return sorted(self._consulta(f"SELECT DISTINCT CVE_AGEB FROM {self._fuente('urbano')}{w}", p)['CVE_AGEB'].dropna())
+
+    def seleccion(self, sel_loc, sel_ageb, geometria=True):
+        """Solo las filas de la zona; la geometría (WKB) se decodifica solo si se pide."""
+        salida = []
+        for capa in CAPAS:
+            w, p = self._filtro(capa, sel_loc, sel_ageb)
+            cols = "*" if geometria else "* EXCLUDE (geometry)"
+            df = self._consulta(f"SELECT {cols} FROM {self._fuente(capa)}{w}", p)
+            df['TIPO'] = TIPOS[capa]
+            if geometria:
+                geom = gpd.GeoSeries.from_wkb(df.pop('geometry').map(bytes), crs="EPSG:4326")
+                df = gpd.GeoDataFrame(df, geometry=geom, crs="EPSG:4326")
+            salida.append(df)
+        return tuple(salida)
+
+    def lotes(self, capa, sel_loc, sel_ageb, claves=None, tamano=TAMANO_LOTE):
+        """Igual que AlmacenArchivos.lotes, leyendo el Parquet por lotes (nunca la zona completa)."""
+        w, p = self._filtro(capa, sel_loc, sel_ageb)
+        if claves is not None:
+            w += (" AND " if w else " WHERE ") + "CVEGEO IN (SELECT UNNEST(?))"
+            p = p + [list(claves)]
+        lector = self.con.cursor().execute(f"SELECT * FROM {self._fuente(capa)}{w}", p).to_arrow_reader(tamano)
+        for lote in lector:
+            df = lote.to_pandas()
+            df['TIPO'] = TIPOS[capa]
+            geom = gpd.GeoSeries.from_wkb(df.pop('geometry').map(bytes), crs="EPSG:4326")
+            yield gpd.GeoDataFrame(df, geometry=geom, crs="EPSG:4326")
+
+    def esquema(self, capa):
+        """Tipos Arrow de los atributos tal como están declarados en el Parquet (más TIPO)."""
+        t = self.con.cursor().execute(f"SELECT * EXCLUDE (geometry) FROM {self._fuente(capa)} LIMIT 0").to_arrow_table()
+        return t.schema.append(pa.field('TIPO', pa.string()))
+
+    def agregados(self, sel_loc, sel_ageb, sumas=(), productos=()):
+        """Las mismas sumas que AlmacenArchivos, resueltas dentro de DuckDB."""
+        def expr(c, capa):
+            if c not in self.columnas[capa]: return "0.0"
+            return f'COALESCE(TRY_CAST("{c}" AS DOUBLE), 0)'
+
+        claves = list(sumas) + [_clave_suma(p) for p in productos]
+        res = {k: 0.0 for k in claves}
+        for capa in CAPAS:
+            sel = [f"SUM({expr(c, capa)})" for c in sumas]
+            sel += [f"SUM({expr(a, capa)} * {expr(b, capa)})" for a, b in productos]
+            if not sel: break
+            w, p = self._filtro(capa, sel_loc, sel_ageb)
+            fila = self._consulta(f"SELECT {', '.join(sel)} FROM {self._fuente(capa)}{w}", p).iloc[0].tolist()
+            for k, v in zip(claves, fila):
+                res[k] += float(v) if pd.notna(v) else 0.0
+        return res
+
+
+def abrir(tipo=None):
+    """Almacén según SITS_ALMACEN ('archivos' por defecto, o 'duckdb')."""
+    tipo = (tipo or os.environ.get("SITS_ALMACEN", "archivos")).lower()
+    if tipo == "duckdb":
+        return AlmacenDuckDB()
+    return AlmacenArchivos()
+
+
+# ==========================================
+# ESCRITURA / LECTURA PARA LOS SCRIPTS DE PREPARACIÓN
+# ==========================================
+def exportar_parquet(gdf, capa, raiz=RAIZ_PARQUET):
+    """
+    Escribe la capa en Parquet particionado por CVE_ENT/CVE_MUN con la geometría
+    en WKB. Reemplaza solo las particiones que vienen en 'gdf'.
+    """
+    if gdf.crs is not None and gdf.crs != "EPSG:4326":
+        gdf = gdf.to_crs("EPSG:4326")
+    df = pd.DataFrame(gdf.drop(columns=gdf.geometry.name))
+    df['geometry'] = gdf.geometry.to_wkb().to_numpy()
+    for c in PARTICIONES:
+        df[c] = df[c].astype(str) if c in df.columns else ""
+    df.to_parquet(os.path.join(raiz, capa), partition_cols=PARTICIONES, index=False, existing_data_behavior='delete_matching')
+
+
+def leer_censo(ruta, entidad, municipios, col_mun='MUN'):
+    """
+    Lee solo las filas de la entidad/municipio del CSV del censo (todo como texto).
+    Con DuckDB el filtro se aplica al leer y el archivo nacional no pasa por memoria.
+    """
+    try:
+        import duckdb
+    except ImportError:
+        df = pd.read_csv(ruta, dtype=str)
+        return df[(df['ENTIDAD'] == entidad) & (df[col_mun].isin(municipios))].copy()
+    ruta_sql = ruta.replace("'", "''")
+    marcas = ", ".join("?" for _ in municipios)
+    return duckdb.connect().execute(
+        f"SELECT * FROM read_csv('{ruta_sql}', all_varchar=true, header=true) WHERE ENTIDAD = ? AND {col_mun} IN ({marcas})",
+        [entidad] + list(municipios)
+    ).df()
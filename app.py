@@ -1,11 +1,19 @@
 import streamlit as st
-import geopandas as gpd
 import pandas as pd
 import folium
 from streamlit_folium import st_folium
+from folium.plugins import Draw
 import plotly.express as px
 import plotly.graph_objects as go
-import os
+import time
+import functools
+import escenarios
+import seleccion_espacial
+import puntos_calientes
+import calentamiento
+import electoral
+import exportacion
+from datos import almacen, localidades, agebs_localidad, seleccion_zona, agregados_zona, agregados_estadistica, METRICAS_ESTADISTICA, DISC_ESTADISTICA, EDAD_ESTADISTICA, base_escenarios, indice_espacial, capa_mapa_urbana, analisis_puntos_calientes, fase2, capa_mapa_fase2, exportar_seleccion
 
 # ==========================================
 # 1. DISEÑO "PREMIUM"
@@ -46,22 +54,11 @@ st.markdown("**Diagnóstico Estratégico Municipal 2025** | H. Ayuntamiento de C
 # ==========================================
 # 2. CARGA DE DATOS
 # ==========================================
-@st.cache_data
-def cargar_datos():
-    f_urb = "sits_urbano_oficial.geojson"
-    f_rur = "sits_rural_oficial.geojson"
-    
-    u = gpd.read_file(f_urb) if os.path.exists(f_urb) else None
-    r = gpd.read_file(f_rur) if os.path.exists(f_rur) else None
-    
-    if u is not None: u['TIPO'] = 'Urbano'
-    if r is not None: r['TIPO'] = 'Rural'
-    
-    return u, r
-
-gdf_u, gdf_r = cargar_datos()
+# Calentamiento de cachés en segundo plano (una sola vez por proceso). Con
+# 'python servidor.py' ya arrancó antes de la primera sesión y esto no hace nada
+calentamiento.iniciar()
 
-if gdf_u is None or gdf_r is None:
+if not almacen().disponible():
     st.error("⚠️ Error Crítico: Ejecute 'prepara_datos_final.py' primero para generar los archivos GeoJSON.")
     st.stop()
 
@@ -71,30 +68,26 @@ if gdf_u is None or gdf_r is None:
 with st.sidebar:
     st.image("https://cdn-icons-png.flaticon.com/512/235/235861.png", width=50)
     st.header("🎛️ Panel de Control")
+    estado_cal = calentamiento.estado()
+    if not estado_cal["listo"]:
+        st.caption(f"⏳ Preparando vistas ({estado_cal['progreso']:.0%}): {estado_cal['fase']}")
     
     st.markdown('<div class="filter-container">', unsafe_allow_html=True)
     st.markdown("**1. Nivel Territorial**")
     
     # A. LOCALIDAD
-    all_locs = sorted(list(set(gdf_u['NOM_LOC'].unique()) | set(gdf_r['NOM_LOC'].unique())))
-    sel_loc = st.selectbox("📍 Seleccione Localidad:", ["TODO EL MUNICIPIO"] + all_locs)
-    
-    du = gdf_u.copy()
-    dr = gdf_r.copy()
-    
-    if sel_loc != "TODO EL MUNICIPIO":
-        du = du[du['NOM_LOC'] == sel_loc]
-        dr = dr[dr['NOM_LOC'] == sel_loc]
+    all_locs = localidades()
+    sel_loc = st.selectbox("📍 Seleccione Localidad:", ["TODO EL MUNICIPIO"] + all_locs, key="sel_loc")
     
     # B. AGEB
     sel_ageb = "TODAS"
-    if not du.empty:
-        agebs = sorted(du['CVE_AGEB'].unique())
-        if len(agebs) > 0:
-            st.markdown("**2. Colonia / AGEB**")
-            sel_ageb = st.selectbox("🏘️ Seleccione Zona:", ["TODAS"] + agebs)
-            if sel_ageb != "TODAS":
-                du = du[du['CVE_AGEB'] == sel_ageb]
+    agebs = agebs_localidad(sel_loc)
+    if len(agebs) > 0:
+        st.markdown("**2. Colonia / AGEB**")
+        sel_ageb = st.selectbox("🏘️ Seleccione Zona:", ["TODAS"] + agebs, key="sel_ageb")
+    
+    # El almacén filtra y solo devuelve las geometrías de la zona
+    du, dr = seleccion_zona(sel_loc, sel_ageb)
     
     st.markdown('</div>', unsafe_allow_html=True)
     st.write("")
@@ -110,7 +103,14 @@ with st.sidebar:
         "CAR_SALUD": "🏥 Acceso a Salud",
         "CAR_EDU": "🎓 Rezago Educativo"
     }
-    carencia = st.radio("Variable:", list(dict_inds.keys()), format_func=lambda x: dict_inds[x])
+    carencia = st.radio("Variable:", list(dict_inds.keys()), format_func=lambda x: dict_inds[x], key="carencia")
+    st.markdown('</div>', unsafe_allow_html=True)
+    st.write("")
+
+    # D. ANÁLISIS ESPACIAL
+    st.markdown('<div class="filter-container">', unsafe_allow_html=True)
+    st.markdown("**4. Análisis Espacial**")
+    capa_calientes = st.checkbox("🔥 Puntos Calientes (Gi*)", value=False, help="Conglomerados estadísticamente significativos (p < 0.05, 999 permutaciones)")
     st.markdown('</div>', unsafe_allow_html=True)
 
 lbl_zona = sel_loc
@@ -128,290 +128,477 @@ def get_bounds_center(gdf):
 # ==========================================
 # 4. PESTAÑAS
 # ==========================================
-tab_mapa, tab_stats, tab_comp = st.tabs(["🗺️ MAPA GEOESPACIAL", "📊 ESTADÍSTICA POBLACIONAL", "⚖️ COMPARATIVA 2020-2025"])
+# on_change="rerun": Streamlit sabe qué pestaña está abierta (tab.open) y en cada
+# rerun solo se dibuja esa; las demás no calculan ni envían nada
+tab_mapa, tab_stats, tab_comp, tab_sim, tab_fase2 = st.tabs(
+    ["🗺️ MAPA GEOESPACIAL", "📊 ESTADÍSTICA POBLACIONAL", "⚖️ COMPARATIVA 2020-2025", "🧪 SIMULADOR DE ESCENARIOS", "🗳️ ESTRATEGIA FASE 2"],
+    key="pestaña", on_change="rerun"
+)
+
+# Los widgets de una pestaña cerrada no se dibujan y Streamlit olvidaría su valor.
+# Todo widget con valor dentro de una pestaña lleva key=<prefijo de su pestaña> + nombre
+# y aquí se reasigna para que siga igual al volver a abrirla. Los botones van sin
+# prefijo: su valor no se puede asignar.
+K_MAPA, K_STATS, K_SIM, K_FASE2 = "mapa.", "stats.", "sim.", "f2."
+for pestaña, prefijo in ((tab_mapa, K_MAPA), (tab_stats, K_STATS), (tab_sim, K_SIM), (tab_fase2, K_FASE2)):
+    if not pestaña.open:
+        for k in [k for k in st.session_state if str(k).startswith(prefijo)]:
+            st.session_state[k] = st.session_state[k]
 
 # --- TAB 1: MAPA ---
 with tab_mapa:
-    c1, c2 = st.columns([3, 1])
-    with c1:
-        # Lógica de centrado robusta
-        if not du.empty:
-            clat, clon = get_bounds_center(du)
-            zoom = 15 if sel_ageb != "TODAS" else (14 if sel_loc != "TODO EL MUNICIPIO" else 12)
-        elif not dr.empty:
-            clat, clon = get_bounds_center(dr)
-            zoom = 13
-        else:
-            clat, clon = 18.42, -95.11
-            zoom = 12
+    if tab_mapa.open:
+        c1, c2 = st.columns([3, 1])
+        with c1:
+            # Lógica de centrado robusta
+            if not du.empty:
+                clat, clon = get_bounds_center(du)
+                zoom = 15 if sel_ageb != "TODAS" else (14 if sel_loc != "TODO EL MUNICIPIO" else 12)
+            elif not dr.empty:
+                clat, clon = get_bounds_center(dr)
+                zoom = 13
+            else:
+                clat, clon = 18.42, -95.11
+                zoom = 12
 
-        m = folium.Map([clat, clon], zoom_start=zoom, tiles="CartoDB positron")
+            m = folium.Map([clat, clon], zoom_start=zoom, tiles="CartoDB positron")
         
-        def color_oficial(val):
-            if val >= 0.4: return '#800000'
-            elif val >= 0.25: return '#ff0000'
-            elif val >= 0.15: return '#ffa500'
-            elif val > 0: return '#ffff00'
-            else: return '#008000'
-
-        if not du.empty:
-            folium.Choropleth(
-                geo_data=du, data=du, columns=['CVEGEO', carencia],
-                key_on='feature.properties.CVEGEO',
-                fill_color='YlOrRd', fill_opacity=0.7, line_opacity=0.1,
-                name="Zonas Urbanas", legend_name="Intensidad del Rezago"
-            ).add_to(m)
-            folium.GeoJson(du, tooltip=folium.GeoJsonTooltip(fields=['NOM_LOC', 'CVE_AGEB', carencia], aliases=['Localidad:', 'AGEB:', 'Rezago:'], localize=True)).add_to(m)
-
-        if not dr.empty:
-            for _, row in dr.iterrows():
-                folium.CircleMarker(
-                    location=[row.geometry.centroid.y, row.geometry.centroid.x],
-                    radius=min(max(row.get('POBTOT_25', 100)/40, 5), 20), # Blindaje si falta columna
-                    color='#333', weight=1, fill=True, fill_color=color_oficial(row.get(carencia, 0)), fill_opacity=0.9,
-                    popup=f"<b>{row['NOM_LOC']}</b><br>Val: {row.get(carencia,0):.1%}"
+            def color_oficial(val):
+                if val >= 0.4: return '#800000'
+                elif val >= 0.25: return '#ff0000'
+                elif val >= 0.15: return '#ffa500'
+                elif val > 0: return '#ffff00'
+                else: return '#008000'
+
+            if not du.empty:
+                # TopoJSON cuantizado con solo los campos que usa el mapa (carga útil ligera)
+                folium.Choropleth(
+                    geo_data=capa_mapa_urbana(sel_loc, sel_ageb, carencia),
+                    topojson='objects.urbano', data=du, columns=['CVEGEO', carencia],
+                    key_on='feature.properties.CVEGEO',
+                    fill_color='YlOrRd', fill_opacity=0.7, line_opacity=0.1,
+                    name="Zonas Urbanas", legend_name="Intensidad del Rezago"
                 ).add_to(m)
+                folium.TopoJson(
+                    capa_mapa_urbana(sel_loc, sel_ageb, carencia), 'objects.urbano',
+                    tooltip=folium.GeoJsonTooltip(fields=['NOM_LOC', 'CVE_AGEB', carencia], aliases=['Localidad:', 'AGEB:', 'Rezago:'], localize=True)
+                ).add_to(m)
+
+            if not dr.empty:
+                for _, row in dr.iterrows():
+                    folium.CircleMarker(
+                        location=[row.geometry.centroid.y, row.geometry.centroid.x],
+                        radius=min(max(row.get('POBTOT_25', 100)/40, 5), 20), # Blindaje si falta columna
+                        color='#333', weight=1, fill=True, fill_color=color_oficial(row.get(carencia, 0)), fill_opacity=0.9,
+                        popup=f"<b>{row['NOM_LOC']}</b><br>Val: {row.get(carencia,0):.1%}"
+                    ).add_to(m)
         
-        # Corrección width para st_folium
-        st_folium(m, height=600, width=None) # width=None usa el ancho completo del contenedor por defecto
-
-    with c2:
-        st.markdown(f"**Viendo:** {dict_inds[carencia]}")
-        st.write("---")
-        st.markdown("""
-        **Simbología (Nivel de Urgencia):**
-        * <span class='dot red'></span> **Muy Alto (>40%)**
-        * <span class='dot orange'></span> **Alto (25-40%)**
-        * <span class='dot yellow'></span> **Medio (15-25%)**
-        * <span class='dot green'></span> **Bajo (<15%)**
-        """, unsafe_allow_html=True)
+            if capa_calientes:
+                df_hs = analisis_puntos_calientes()
+                col_gi, col_lisa = f'GI_CLASE_{carencia}', f'LISA_CLASE_{carencia}'
+                capa_hs = pd.concat([du, dr])[['CVEGEO', 'NOM_LOC', 'geometry']].merge(df_hs[[col_gi, col_lisa]], left_on='CVEGEO', right_index=True)
+                capa_hs = capa_hs[capa_hs[col_gi] != "No Significativo"]
+                if not capa_hs.empty:
+                    folium.GeoJson(
+                        capa_hs, name="Puntos Calientes (Gi*)",
+                        style_function=lambda f: {'fillColor': puntos_calientes.COLORES_GI[f['properties'][col_gi]], 'color': '#333', 'weight': 0.5, 'fillOpacity': 0.75},
+                        tooltip=folium.GeoJsonTooltip(fields=['NOM_LOC', col_gi, col_lisa], aliases=['Localidad:', 'Gi*:', 'LISA:'])
+                    ).add_to(m)
+
+            # Herramienta de dibujo para la selección espacial (polígono, rectángulo o radio)
+            Draw(export=False, draw_options={'polyline': False, 'marker': False, 'circlemarker': False}).add_to(m)
+
+            # Corrección width para st_folium
+            salida_mapa = st_folium(m, height=600, width=None, returned_objects=["last_active_drawing"]) # width=None usa el ancho completo del contenedor por defecto
+
+        with c2:
+            st.markdown(f"**Viendo:** {dict_inds[carencia]}")
+            st.write("---")
+            st.markdown("""
+            **Simbología (Nivel de Urgencia):**
+            * <span class='dot red'></span> **Muy Alto (>40%)**
+            * <span class='dot orange'></span> **Alto (25-40%)**
+            * <span class='dot yellow'></span> **Medio (15-25%)**
+            * <span class='dot green'></span> **Bajo (<15%)**
+            """, unsafe_allow_html=True)
+            if capa_calientes:
+                st.markdown("""
+                **Puntos Calientes (Gi*):**
+                * <span class='dot' style='background-color:#b2182b;'></span> **Conglomerado de Rezago**
+                * <span class='dot' style='background-color:#2166ac;'></span> **Conglomerado de Bienestar**
+                """, unsafe_allow_html=True)
+            st.write("---")
+            st.caption("✏️ Dibuje un polígono o un círculo en el mapa para obtener los totales del área.")
+            st.write("---")
+            st.markdown("**📦 Exportar para SIG**")
+            formato_exp = st.radio("Formato:", list(exportacion.FORMATOS), horizontal=True, key=K_MAPA + "exp_formato")
+            ext_exp = exportacion.FORMATOS[formato_exp]["ext"]
+            # El archivo se genera solo al hacer clic (en otro hilo), por lotes desde el almacén
+            st.download_button(
+                "🗺️ Descargar zona (polígonos)",
+                data=functools.partial(exportar_seleccion, formato_exp, sel_loc, sel_ageb),
+                file_name=f"SITS_{lbl_zona.replace(' ', '_')}{ext_exp}",
+                mime=exportacion.FORMATOS[formato_exp]["mime"], on_click="ignore", key="exp_zona"
+            )
+
+        # SELECCIÓN ESPACIAL (FIGURA DIBUJADA EN EL MAPA)
+        geom_sel = seleccion_espacial.geometria_dibujo((salida_mapa or {}).get("last_active_drawing"))
+        if geom_sel is not None:
+            t0 = time.perf_counter()
+            sel_esp = seleccion_espacial.agregar(indice_espacial(), geom_sel)
+            tot_esp = seleccion_espacial.totales(sel_esp)
+            t_ms = (time.perf_counter() - t0) * 1000
+
+            st.markdown(f"#### 📐 Selección Espacial ({geom_sel.area / 1e6:.2f} km²)")
+            if not tot_esp:
+                st.warning("La figura no toca ninguna manzana ni localidad.")
+            else:
+                e1, e2, e3, e4 = st.columns(4)
+                e1.metric("Población 2025", f"{int(tot_esp['POBTOT_25']):,}")
+                e2.metric(f"Afectados: {dict_inds[carencia]}", f"{int(tot_esp[f'AFEC_{carencia}']):,}")
+                e3.metric("Manzanas", f"{tot_esp['N_MANZANAS']:,}")
+                e4.metric("Localidades", f"{tot_esp['N_LOCALIDADES']:,}")
+
+                df_esp = sel_esp.groupby(['NOM_LOC', 'TIPO'], as_index=False)[['POBTOT_25', 'FRACCION'] + [f'AFEC_{c}' for c in seleccion_espacial.COLS_CARENCIA]].sum()
+                df_esp = df_esp.rename(columns={'NOM_LOC': 'Localidad', 'POBTOT_25': 'Población 2025', 'FRACCION': 'Polígonos (equiv.)'})
+                df_esp = df_esp.rename(columns={f'AFEC_{c}': dict_inds[c] for c in seleccion_espacial.COLS_CARENCIA})
+                st.dataframe(df_esp.sort_values('Población 2025', ascending=False).round(0), hide_index=True, use_container_width=True)
+                st.caption(f"⚡ {len(sel_esp):,} polígonos tocados (ponderados por área cubierta) en {t_ms:.1f} ms")
+                st.download_button(
+                    f"🗺️ Descargar polígonos de la figura ({formato_exp})",
+                    data=functools.partial(exportar_seleccion, formato_exp, "TODO EL MUNICIPIO", "TODAS", dict(zip(sel_esp['CVEGEO'], sel_esp['FRACCION']))),
+                    file_name=f"SITS_seleccion_espacial{ext_exp}",
+                    mime=exportacion.FORMATOS[formato_exp]["mime"], on_click="ignore", key="exp_figura"
+                )
 
 # --- TAB 2: ESTADÍSTICAS ---
 with tab_stats:
-    st.markdown(f"### 📊 Reporte: {lbl_zona}")
+    if tab_stats.open:
+        st.markdown(f"### 📊 Reporte: {lbl_zona}")
     
-    col_f1, col_f2 = st.columns([1, 2])
-    with col_f1:
-        st.markdown("**🎯 Grupo Poblacional:**")
-        opciones_pob = {
-            "Población Total": "POBTOT_25",
-            "Mujeres": "POB_FEM_25",
-            "Hombres": "POB_MAS_25",
-            "Niños (0-14)": "POB_NINOS_25",
-            "Adultos Mayores (65+)": "POB_MAYORES_25",
-            "🏠 Hogares con Jefatura Femenina": "HOGARES_JEFAS_25",
-            "🧡 Población Afromexicana": "POB_AFRO_25",
-            "💬 Población Indígena (Lengua)": "POB_INDIGENA_25",
-            "♿ Personas con Discapacidad": "POB_DISC_25"
-        }
-        # CORREGIDO: Label visible collapsed
-        tipo_filtro = st.selectbox(
-            "Seleccione Grupo",
-            list(opciones_pob.keys()),
-            label_visibility="collapsed"
-        )
-        col_focalizada = opciones_pob[tipo_filtro]
+        col_f1, col_f2 = st.columns([1, 2])
+        with col_f1:
+            st.markdown("**🎯 Grupo Poblacional:**")
+            opciones_pob = {
+                "Población Total": "POBTOT_25",
+                "Mujeres": "POB_FEM_25",
+                "Hombres": "POB_MAS_25",
+                "Niños (0-14)": "POB_NINOS_25",
+                "Adultos Mayores (65+)": "POB_MAYORES_25",
+                "🏠 Hogares con Jefatura Femenina": "HOGARES_JEFAS_25",
+                "🧡 Población Afromexicana": "POB_AFRO_25",
+                "💬 Población Indígena (Lengua)": "POB_INDIGENA_25",
+                "♿ Personas con Discapacidad": "POB_DISC_25"
+            }
+            # CORREGIDO: Label visible collapsed
+            tipo_filtro = st.selectbox(
+                "Seleccione Grupo",
+                list(opciones_pob.keys()),
+                label_visibility="collapsed",
+                key=K_STATS + "tipo_filtro"
+            )
+            col_focalizada = opciones_pob[tipo_filtro]
     
-    df_zona = pd.concat([du, dr])
+        df_zona = pd.concat([du, dr])
     
-    if df_zona.empty:
-        st.warning("No hay datos para calcular.")
-    else:
-        # Blindaje de tipos para evitar errores de String
-        if col_focalizada in df_zona.columns:
-            df_zona[col_focalizada] = pd.to_numeric(df_zona[col_focalizada], errors='coerce').fillna(0)
-        
-        if tipo_filtro == "🏠 Hogares con Jefatura Femenina":
-            lbl_base = "Total Hogares"; lbl_afec = "Hogares Jefas"
+        if df_zona.empty:
+            st.warning("No hay datos para calcular.")
         else:
-            lbl_base = f"Total {tipo_filtro}"; lbl_afec = "Con Carencia"
+            # Blindaje de tipos para evitar errores de String
+            for c in [col_focalizada, carencia]:
+                if c in df_zona.columns:
+                    df_zona[c] = pd.to_numeric(df_zona[c], errors='coerce').fillna(0)
+        
+            # Sumas ponderadas resueltas por el almacén (consulta en modo DuckDB)
+            metricas, cols_disc, cols_edad = METRICAS_ESTADISTICA, DISC_ESTADISTICA, EDAD_ESTADISTICA
+            agg = agregados_estadistica(sel_loc, sel_ageb, col_focalizada, carencia)
+        
+            if tipo_filtro == "🏠 Hogares con Jefatura Femenina":
+                lbl_base = "Total Hogares"; lbl_afec = "Hogares Jefas"
+            else:
+                lbl_base = f"Total {tipo_filtro}"; lbl_afec = "Con Carencia"
 
-        total_grupo = df_zona[col_focalizada].sum()
-        afectados_estimados = (df_zona[col_focalizada] * df_zona[carencia]).sum()
-        pct_real = (afectados_estimados / total_grupo * 100) if total_grupo > 0 else 0
+            total_grupo = agg[col_focalizada]
+            afectados_estimados = agg[f"{col_focalizada}*{carencia}"]
+            pct_real = (afectados_estimados / total_grupo * 100) if total_grupo > 0 else 0
         
-        c1, c2, c3, c4 = st.columns(4)
-        with c1:
-            st.markdown(f"""<div class="kpi-card"><div class="kpi-title">{lbl_base} (2025)</div><div class="kpi-value">{int(total_grupo):,}</div></div>""", unsafe_allow_html=True)
-        with c2:
-            st.markdown(f"""<div class="kpi-card" style="border-left-color: #c0392b;"><div class="kpi-title">{lbl_afec}</div><div class="kpi-value">{int(afectados_estimados):,}</div><div class="kpi-sub">Estimado Vulnerable</div></div>""", unsafe_allow_html=True)
-        with c3:
-            st.markdown(f"""<div class="kpi-card" style="border-left-color: #f1c40f;"><div class="kpi-title">INTENSIDAD</div><div class="kpi-value">{pct_real:.1f}%</div></div>""", unsafe_allow_html=True)
-        with c4:
-             mujeres = df_zona['POB_FEM_25'].sum() if 'POB_FEM_25' in df_zona.columns else 0
-             st.markdown(f"""<div class="kpi-card" style="border-left-color: #8e44ad;"><div class="kpi-title">MUJERES</div><div class="kpi-value">{int(mujeres):,}</div></div>""", unsafe_allow_html=True)
+            c1, c2, c3, c4 = st.columns(4)
+            with c1:
+                st.markdown(f"""<div class="kpi-card"><div class="kpi-title">{lbl_base} (2025)</div><div class="kpi-value">{int(total_grupo):,}</div></div>""", unsafe_allow_html=True)
+            with c2:
+                st.markdown(f"""<div class="kpi-card" style="border-left-color: #c0392b;"><div class="kpi-title">{lbl_afec}</div><div class="kpi-value">{int(afectados_estimados):,}</div><div class="kpi-sub">Estimado Vulnerable</div></div>""", unsafe_allow_html=True)
+            with c3:
+                st.markdown(f"""<div class="kpi-card" style="border-left-color: #f1c40f;"><div class="kpi-title">INTENSIDAD</div><div class="kpi-value">{pct_real:.1f}%</div></div>""", unsafe_allow_html=True)
+            with c4:
+                 mujeres = agg['POB_FEM_25']
+                 st.markdown(f"""<div class="kpi-card" style="border-left-color: #8e44ad;"><div class="kpi-title">MUJERES</div><div class="kpi-value">{int(mujeres):,}</div></div>""", unsafe_allow_html=True)
         
-        st.write("---")
-
-        g1, g2 = st.columns(2)
-        with g1:
-            metricas = ['CAR_ALIM', 'CAR_SERV', 'CAR_VIV', 'CAR_SALUD', 'CAR_EDU']
-            vals = []
-            for m in metricas:
-                 df_zona[m] = pd.to_numeric(df_zona[m], errors='coerce').fillna(0)
-                 vals.append((df_zona[m] * df_zona[col_focalizada]).sum())
-            
-            nombres = ['Alimentación', 'Servicios', 'Vivienda', 'Salud', 'Educación']
-            fig = px.bar(x=nombres, y=vals, text_auto='.2s', title="Personas Afectadas por Tipo", labels={'y':'Personas', 'x':''})
-            fig.update_traces(marker_color='#e74c3c')
-            # CORREGIDO: width="stretch" (nueva API) en vez de use_container_width
-            st.plotly_chart(fig, use_container_width=True)
+            st.write("---")
+
+            g1, g2 = st.columns(2)
+            with g1:
+                vals = [agg[f"{col_focalizada}*{m}"] for m in metricas]
             
-        with g2:
-            # Validación de columnas antes de graficar
-            cols_disc = ['DISC_MOTRIZ_25', 'DISC_VISUAL_25', 'DISC_AUDITIVA_25', 'DISC_MENTAL_25']
-            cols_edad = ['POB_NINOS_25', 'POB_ADULTOS_25', 'POB_MAYORES_25']
+                nombres = ['Alimentación', 'Servicios', 'Vivienda', 'Salud', 'Educación']
+                fig = px.bar(x=nombres, y=vals, text_auto='.2s', title="Personas Afectadas por Tipo", labels={'y':'Personas', 'x':''})
+                fig.update_traces(marker_color='#e74c3c')
+                # CORREGIDO: width="stretch" (nueva API) en vez de use_container_width
+                st.plotly_chart(fig, use_container_width=True)
             
-            # Crear columnas si no existen (blindaje)
-            for c in cols_disc + cols_edad:
-                if c not in df_zona.columns: df_zona[c] = 0
-
-            if tipo_filtro == "♿ Personas con Discapacidad":
-                vals_disc = [
-                    pd.to_numeric(df_zona['DISC_MOTRIZ_25'], errors='coerce').sum(),
-                    pd.to_numeric(df_zona['DISC_VISUAL_25'], errors='coerce').sum(),
-                    pd.to_numeric(df_zona['DISC_AUDITIVA_25'], errors='coerce').sum(),
-                    pd.to_numeric(df_zona['DISC_MENTAL_25'], errors='coerce').sum()
-                ]
-                fig2 = px.pie(names=['Motriz', 'Visual', 'Auditiva', 'Mental'], values=vals_disc, title="Tipos de Discapacidad", hole=0.4)
-            else:
-                edades = pd.DataFrame({'Grupo': ['0-14', '15-64', '65+'], 'Pob': [
-                    pd.to_numeric(df_zona['POB_NINOS_25'], errors='coerce').sum(),
-                    pd.to_numeric(df_zona['POB_ADULTOS_25'], errors='coerce').sum(),
-                    pd.to_numeric(df_zona['POB_MAYORES_25'], errors='coerce').sum()
-                ]})
-                fig2 = px.pie(edades, values='Pob', names='Grupo', hole=0.4, title="Distribución por Edad")
+            with g2:
+                # Columnas faltantes cuentan como 0 (blindaje dentro del almacén)
+                if tipo_filtro == "♿ Personas con Discapacidad":
+                    vals_disc = [agg[c] for c in cols_disc]
+                    fig2 = px.pie(names=['Motriz', 'Visual', 'Auditiva', 'Mental'], values=vals_disc, title="Tipos de Discapacidad", hole=0.4)
+                else:
+                    edades = pd.DataFrame({'Grupo': ['0-14', '15-64', '65+'], 'Pob': [agg[c] for c in cols_edad]})
+                    fig2 = px.pie(edades, values='Pob', names='Grupo', hole=0.4, title="Distribución por Edad")
             
-            st.plotly_chart(fig2, use_container_width=True)
-
-        st.subheader("📋 Padrón de Focalización")
-        df_tabla = df_zona.copy()
-        df_tabla['Ubicación'] = df_tabla.apply(lambda x: x['NOM_LOC'] if x['TIPO']=='Rural' else f"{x['NOM_LOC']} - AGEB {x['CVE_AGEB']}", axis=1)
-        df_tabla['Grupo Objetivo'] = df_tabla[col_focalizada]
-        df_tabla['Estimado Afectados'] = (df_tabla[col_focalizada] * df_tabla[carencia]).astype(int)
-        df_tabla['% Rezago'] = (df_tabla[carencia] * 100).round(1)
+                st.plotly_chart(fig2, use_container_width=True)
+
+            st.subheader("📋 Padrón de Focalización")
+            df_tabla = df_zona.copy()
+            df_tabla['Ubicación'] = df_tabla.apply(lambda x: x['NOM_LOC'] if x['TIPO']=='Rural' else f"{x['NOM_LOC']} - AGEB {x['CVE_AGEB']}", axis=1)
+            df_tabla['Grupo Objetivo'] = df_tabla[col_focalizada]
+            df_tabla['Estimado Afectados'] = (df_tabla[col_focalizada] * df_tabla[carencia]).astype(int)
+            df_tabla['% Rezago'] = (df_tabla[carencia] * 100).round(1)
         
-        cols_fin = ['Ubicación', 'TIPO', 'Grupo Objetivo', 'Estimado Afectados', '% Rezago']
-        tabla_final = df_tabla[cols_fin].sort_values('% Rezago', ascending=False)
+            cols_fin = ['Ubicación', 'TIPO', 'Grupo Objetivo', 'Estimado Afectados', '% Rezago']
+            tabla_final = df_tabla[cols_fin].sort_values('% Rezago', ascending=False)
         
-        # CORREGIDO: width="stretch" en lugar de use_container_width para dataframes
-        st.dataframe(
-            tabla_final,
-            hide_index=True,
-            use_container_width=True, # Usamos use_container_width=True porque en versiones <1.30 width="stretch" puede fallar. Si tienes la última versión y te da warning, cambia a width="stretch".
-            column_config={"% Rezago": st.column_config.ProgressColumn("Intensidad", format="%.1f%%", min_value=0, max_value=100)}
-        )
-        csv = tabla_final.to_csv(index=False).encode('utf-8')
-        st.download_button("📥 Descargar Reporte (.csv)", csv, "SITS_Reporte.csv", "text/csv")
+            # CORREGIDO: width="stretch" en lugar de use_container_width para dataframes
+            st.dataframe(
+                tabla_final,
+                hide_index=True,
+                use_container_width=True, # Usamos use_container_width=True porque en versiones <1.30 width="stretch" puede fallar. Si tienes la última versión y te da warning, cambia a width="stretch".
+                column_config={"% Rezago": st.column_config.ProgressColumn("Intensidad", format="%.1f%%", min_value=0, max_value=100)}
+            )
+            csv = tabla_final.to_csv(index=False).encode('utf-8')
+            st.download_button("📥 Descargar Reporte (.csv)", csv, "SITS_Reporte.csv", "text/csv")
 
 # ==========================================
 # TAB 3: COMPARATIVA 2020 VS 2025 (CORREGIDO BLINDAJE)
 # ==========================================
 with tab_comp:
-    st.markdown(f"### ⚖️ Evolución: Real 2020 vs Proyectado 2025")
-    st.caption(f"Zona Analizada: {lbl_zona}")
+    if tab_comp.open:
+        st.markdown(f"### ⚖️ Evolución: Real 2020 vs Proyectado 2025")
+        st.caption(f"Zona Analizada: {lbl_zona}")
 
-    df_comp = pd.concat([du, dr])
+        df_comp = pd.concat([du, dr])
     
-    if df_comp.empty:
-        st.warning("No hay datos.")
-    else:
-        vars_pob = [
-            ("Población Total", "POBTOT", "POBTOT_25"),
-            ("Población Femenina", "POB_FEM", "POB_FEM_25"),
-            ("Población Masculina", "POB_MAS", "POB_MAS_25"),
-            ("Población Indígena", "P_HLI", "POB_INDIGENA_25"),
-            ("Población Afro", "POB_AFRO", "POB_AFRO_25"),
-            ("Discapacidad", "PCON_DISC", "POB_DISC_25")
-        ]
-
-        # 1. CÁLCULO DE CRECIMIENTO POBLACIONAL
-        pob_data = []
-        for label, col20, col25 in vars_pob:
-            
-            # --- BLINDAJE DE TIPOS (CONVERTIR A NUMÉRICO) ---
-            if col20 in df_comp.columns:
-                df_comp[col20] = pd.to_numeric(df_comp[col20], errors='coerce').fillna(0)
-            if col25 in df_comp.columns:
-                df_comp[col25] = pd.to_numeric(df_comp[col25], errors='coerce').fillna(0)
-            # -----------------------------------------------
-
-            val20 = df_comp[col20].sum() if col20 in df_comp.columns else 0
-            val25 = df_comp[col25].sum() if col25 in df_comp.columns else 0
+        if df_comp.empty:
+            st.warning("No hay datos.")
+        else:
+            vars_pob = [
+                ("Población Total", "POBTOT", "POBTOT_25"),
+                ("Población Femenina", "POB_FEM", "POB_FEM_25"),
+                ("Población Masculina", "POB_MAS", "POB_MAS_25"),
+                ("Población Indígena", "P_HLI", "POB_INDIGENA_25"),
+                ("Población Afro", "POB_AFRO", "POB_AFRO_25"),
+                ("Discapacidad", "PCON_DISC", "POB_DISC_25")
+            ]
+
+            # 1. CÁLCULO DE CRECIMIENTO POBLACIONAL (sumas resueltas por el almacén)
+            agg_pob = agregados_zona(sel_loc, sel_ageb, sumas=tuple(c for _, c20, c25 in vars_pob for c in (c20, c25)))
+            pob_data = []
+            for label, col20, col25 in vars_pob:
+                val20 = agg_pob[col20]
+                val25 = agg_pob[col25]
             
-            diff = val25 - val20
-            pct = (diff / val20 * 100) if val20 > 0 else 0
-            pob_data.append({"Variable": label, "2020 (Censo)": val20, "2025 (Estimado)": val25, "Diferencia": diff, "% Cambio": pct})
+                diff = val25 - val20
+                pct = (diff / val20 * 100) if val20 > 0 else 0
+                pob_data.append({"Variable": label, "2020 (Censo)": val20, "2025 (Estimado)": val25, "Diferencia": diff, "% Cambio": pct})
         
-        df_pob_viz = pd.DataFrame(pob_data)
+            df_pob_viz = pd.DataFrame(pob_data)
 
-        # KPIs Comparativos
-        tot20 = df_pob_viz.loc[0, "2020 (Censo)"]
-        tot25 = df_pob_viz.loc[0, "2025 (Estimado)"]
-        crecimiento = df_pob_viz.loc[0, "% Cambio"]
+            # KPIs Comparativos
+            tot20 = df_pob_viz.loc[0, "2020 (Censo)"]
+            tot25 = df_pob_viz.loc[0, "2025 (Estimado)"]
+            crecimiento = df_pob_viz.loc[0, "% Cambio"]
         
-        k1, k2, k3 = st.columns(3)
-        k1.metric("Población 2020 (Real)", f"{int(tot20):,}")
-        k2.metric("Población 2025 (Proyección)", f"{int(tot25):,}")
-        k3.metric("Crecimiento Quinquenal", f"{crecimiento:.1f}%", delta=f"{int(tot25-tot20)} personas")
+            k1, k2, k3 = st.columns(3)
+            k1.metric("Población 2020 (Real)", f"{int(tot20):,}")
+            k2.metric("Población 2025 (Proyección)", f"{int(tot25):,}")
+            k3.metric("Crecimiento Quinquenal", f"{crecimiento:.1f}%", delta=f"{int(tot25-tot20)} personas")
         
-        st.write("---")
-
-        # GRÁFICA COMPARATIVA DE POBLACIÓN
-        st.subheader("📈 Dinámica Poblacional")
-        fig_comp = go.Figure()
-        fig_comp.add_trace(go.Bar(x=df_pob_viz['Variable'], y=df_pob_viz['2020 (Censo)'], name='2020', marker_color='#95a5a6'))
-        fig_comp.add_trace(go.Bar(x=df_pob_viz['Variable'], y=df_pob_viz['2025 (Estimado)'], name='2025', marker_color='#3498db'))
-        fig_comp.update_layout(barmode='group', height=400, title="Comparativa de Volúmenes")
-        st.plotly_chart(fig_comp, use_container_width=True)
-
-        # 3. COMPARATIVA DE INDICADORES (REZAGOS)
-        st.subheader("📉 Evolución de Carencias (Porcentajes)")
+            st.write("---")
+
+            # GRÁFICA COMPARATIVA DE POBLACIÓN
+            st.subheader("📈 Dinámica Poblacional")
+            fig_comp = go.Figure()
+            fig_comp.add_trace(go.Bar(x=df_pob_viz['Variable'], y=df_pob_viz['2020 (Censo)'], name='2020', marker_color='#95a5a6'))
+            fig_comp.add_trace(go.Bar(x=df_pob_viz['Variable'], y=df_pob_viz['2025 (Estimado)'], name='2025', marker_color='#3498db'))
+            fig_comp.update_layout(barmode='group', height=400, title="Comparativa de Volúmenes")
+            st.plotly_chart(fig_comp, use_container_width=True)
+
+            # 3. COMPARATIVA DE INDICADORES (REZAGOS)
+            st.subheader("📉 Evolución de Carencias (Porcentajes)")
         
-        vars_rez = [
-            ("Alimentación", "CAR_ALIM_20", "CAR_ALIM"),
-            ("Servicios Básicos", "CAR_SERV_20", "CAR_SERV"),
-            ("Calidad Vivienda", "CAR_VIV_20", "CAR_VIV"),
-            ("Salud", "CAR_SALUD_20", "CAR_SALUD"),
-            ("Educación", "CAR_EDU_20", "CAR_EDU")
-        ]
+            vars_rez = [
+                ("Alimentación", "CAR_ALIM_20", "CAR_ALIM"),
+                ("Servicios Básicos", "CAR_SERV_20", "CAR_SERV"),
+                ("Calidad Vivienda", "CAR_VIV_20", "CAR_VIV"),
+                ("Salud", "CAR_SALUD_20", "CAR_SALUD"),
+                ("Educación", "CAR_EDU_20", "CAR_EDU")
+            ]
         
-        rez_data = []
-        for label, col20, col25 in vars_rez:
-            # --- BLINDAJE TAMBIÉN AQUÍ ---
-            if col20 in df_comp.columns:
-                 df_comp[col20] = pd.to_numeric(df_comp[col20], errors='coerce').fillna(0)
-            if col25 in df_comp.columns:
-                 df_comp[col25] = pd.to_numeric(df_comp[col25], errors='coerce').fillna(0)
-            
-            # Asegurar que POBTOT es numérico
-            if 'POBTOT' in df_comp.columns: df_comp['POBTOT'] = pd.to_numeric(df_comp['POBTOT'], errors='coerce').fillna(0)
-            if 'POBTOT_25' in df_comp.columns: df_comp['POBTOT_25'] = pd.to_numeric(df_comp['POBTOT_25'], errors='coerce').fillna(0)
-
-            pond25 = (df_comp[col25] * df_comp['POBTOT_25']).sum() / df_comp['POBTOT_25'].sum() * 100
-            
-            if col20 in df_comp.columns:
-                pond20 = (df_comp[col20] * df_comp['POBTOT']).sum() / df_comp['POBTOT'].sum() * 100
-            else:
-                pond20 = 0
+            # Promedios ponderados por población (columnas faltantes cuentan 0)
+            agg_rez = agregados_zona(
+                sel_loc, sel_ageb, sumas=('POBTOT', 'POBTOT_25'),
+                productos=tuple(p for _, col20, col25 in vars_rez for p in ((col25, 'POBTOT_25'), (col20, 'POBTOT')))
+            )
+            rez_data = []
+            for label, col20, col25 in vars_rez:
+                pond25 = agg_rez[f"{col25}*POBTOT_25"] / agg_rez['POBTOT_25'] * 100 if agg_rez['POBTOT_25'] > 0 else 0
+                pond20 = agg_rez[f"{col20}*POBTOT"] / agg_rez['POBTOT'] * 100 if agg_rez['POBTOT'] > 0 else 0
             
-            rez_data.append({"Indicador": label, "2020 (%)": pond20, "2025 (%)": pond25})
+                rez_data.append({"Indicador": label, "2020 (%)": pond20, "2025 (%)": pond25})
 
-        df_rez_viz = pd.DataFrame(rez_data)
+            df_rez_viz = pd.DataFrame(rez_data)
         
-        fig_rez = go.Figure()
+            fig_rez = go.Figure()
         
-        if df_rez_viz['2020 (%)'].sum() > 0:
-            fig_rez.add_trace(go.Bar(x=df_rez_viz['Indicador'], y=df_rez_viz['2020 (%)'], name='2020', marker_color='#bdc3c7'))
-            fig_rez.add_trace(go.Bar(x=df_rez_viz['Indicador'], y=df_rez_viz['2025 (%)'], name='2025', marker_color='#e74c3c'))
-            fig_rez.update_layout(title="Cambio Porcentual en Carencias", yaxis_title="% de Población Afectada", barmode='group')
-            st.plotly_chart(fig_rez, use_container_width=True)
+            if df_rez_viz['2020 (%)'].sum() > 0:
+                fig_rez.add_trace(go.Bar(x=df_rez_viz['Indicador'], y=df_rez_viz['2020 (%)'], name='2020', marker_color='#bdc3c7'))
+                fig_rez.add_trace(go.Bar(x=df_rez_viz['Indicador'], y=df_rez_viz['2025 (%)'], name='2025', marker_color='#e74c3c'))
+                fig_rez.update_layout(title="Cambio Porcentual en Carencias", yaxis_title="% de Población Afectada", barmode='group')
+                st.plotly_chart(fig_rez, use_container_width=True)
             
-            df_rez_viz['Mejora'] = df_rez_viz['2020 (%)'] - df_rez_viz['2025 (%)']
-            st.dataframe(df_rez_viz.style.format("{:.1f}%", subset=['2020 (%)', '2025 (%)', 'Mejora'])
-                         .applymap(lambda v: 'color: green' if v > 0 else 'color: red', subset=['Mejora']),
-                         use_container_width=True)
+                df_rez_viz['Mejora'] = df_rez_viz['2020 (%)'] - df_rez_viz['2025 (%)']
+                st.dataframe(df_rez_viz.style.format("{:.1f}%", subset=['2020 (%)', '2025 (%)', 'Mejora'])
+                             .applymap(lambda v: 'color: green' if v > 0 else 'color: red', subset=['Mejora']),
+                             use_container_width=True)
+            else:
+                st.info("ℹ️ Para ver la comparativa de Carencias, asegúrate de haber ejecutado 'prepara_datos_final.py' para integrar los datos históricos.")
+                fig_rez.add_trace(go.Bar(x=df_rez_viz['Indicador'], y=df_rez_viz['2025 (%)'], name='2025', marker_color='#e74c3c'))
+                st.plotly_chart(fig_rez, use_container_width=True)
+
+# ==========================================
+# TAB 4: SIMULADOR DE ESCENARIOS (¿QUÉ PASA SI...?)
+# ==========================================
+with tab_sim:
+    if tab_sim.open:
+        st.markdown(f"### 🧪 Escenario de Intervención: {lbl_zona}")
+        st.caption("Porcentaje de viviendas con la carencia que se atienden en la zona seleccionada. El resto del municipio queda igual.")
+
+        base_sim = base_escenarios()
+        reducciones = {}
+        if base_sim['palancas'] is not escenarios.PALANCAS:
+            st.warning("⚠️ Las capas no traen los conteos de vivienda (VPH_*): drenaje y luz se simulan juntos. Vuelva a correr 'reparacion_datos_total.py' para separarlos.")
+        cols_sl = st.columns(len(base_sim['palancas']))
+        for col_sl, (clave, (_, etiqueta)) in zip(cols_sl, base_sim['palancas'].items()):
+            with col_sl:
+                reducciones[clave] = st.slider(etiqueta, 0, 100, 0, step=5, format="%d%%", key=K_SIM + clave) / 100
+
+        # Recalculo vectorizado (sin volver a correr el pipeline)
+        t0 = time.perf_counter()
+        mascara = escenarios.mascara_zona(base_sim, sel_loc, sel_ageb)
+        linea_base = escenarios.simular(base_sim, mascara, {})
+        escenario = escenarios.simular(base_sim, mascara, reducciones)
+        df_sim_zona = escenarios.comparar(base_sim, linea_base, escenario, mascara)
+        df_sim_mun = escenarios.comparar(base_sim, linea_base, escenario)
+        t_ms = (time.perf_counter() - t0) * 1000
+
+        if not mascara.any():
+            st.warning("No hay datos para simular.")
+        else:
+            nombres_sim = {"CAR_VIV": "Calidad Vivienda", "CAR_SERV": "Servicios Básicos", "CAR_ALIM": "Alimentación", "SITS_INDEX": "Índice SITS"}
+            df_sim_zona['Indicador'] = df_sim_zona['Indicador'].map(nombres_sim)
+            df_sim_mun['Indicador'] = df_sim_mun['Indicador'].map(nombres_sim)
+
+            k1, k2, k3 = st.columns(3)
+            fila_sits = df_sim_zona.iloc[-1]
+            k1.metric("Índice SITS (Zona)", f"{fila_sits['% Escenario']:.1f}%", delta=f"{fila_sits['% Escenario'] - fila_sits['% Base']:.2f} pts", delta_color="inverse")
+            k2.metric("Personas Afectadas SITS (Zona)", f"{int(fila_sits['Afectados Escenario']):,}", delta=f"{int(fila_sits['Diferencia']):,}", delta_color="inverse")
+            fila_mun = df_sim_mun.iloc[-1]
+            k3.metric("Índice SITS (Municipio)", f"{fila_mun['% Escenario']:.1f}%", delta=f"{fila_mun['% Escenario'] - fila_mun['% Base']:.2f} pts", delta_color="inverse")
+
+            st.write("---")
+
+            fig_sim = go.Figure()
+            fig_sim.add_trace(go.Bar(x=df_sim_zona['Indicador'], y=df_sim_zona['Afectados Base'], name='Línea Base', marker_color='#95a5a6'))
+            fig_sim.add_trace(go.Bar(x=df_sim_zona['Indicador'], y=df_sim_zona['Afectados Escenario'], name='Escenario', marker_color='#27ae60'))
+            fig_sim.update_layout(barmode='group', height=400, title="Personas Afectadas: Línea Base vs Escenario", yaxis_title="Personas")
+            st.plotly_chart(fig_sim, use_container_width=True)
+
+            st.dataframe(
+                df_sim_zona.style.format({"Afectados Base": "{:,.0f}", "Afectados Escenario": "{:,.0f}", "Diferencia": "{:+,.0f}", "% Base": "{:.1f}%", "% Escenario": "{:.1f}%"}),
+                hide_index=True,
+                use_container_width=True
+            )
+            st.caption(f"⚡ Recalculo de {len(mascara):,} polígonos en {t_ms:.1f} ms")
+
+# ==========================================
+# TAB 5: ESTRATEGIA ELECTORAL-SOCIAL (FASE 2)
+# ==========================================
+with tab_fase2:
+    if tab_fase2.open:
+        f2 = fase2()
+        if f2 is None:
+            st.info("ℹ️ Ejecute 'preparar_electoral_fase2.py' para generar las capas electorales (sits_urbano_fase2 / sits_rural_fase2).")
         else:
-            st.info("ℹ️ Para ver la comparativa de Carencias, asegúrate de haber ejecutado 'prepara_datos_final.py' para integrar los datos históricos.")
-            fig_rez.add_trace(go.Bar(x=df_rez_viz['Indicador'], y=df_rez_viz['2025 (%)'], name='2025', marker_color='#e74c3c'))
-            st.plotly_chart(fig_rez, use_container_width=True)
+            st.markdown(f"### 🗳️ Prioridades de Intervención: {lbl_zona}")
+            etiquetas = {p: a for p, (a, _, _) in electoral.ACCIONES.items()}
+            cf1, cf2 = st.columns([3, 1])
+            sel_prio = cf1.multiselect("Acción táctica:", list(etiquetas), default=list(etiquetas), format_func=etiquetas.get, key=K_FASE2 + "acciones")
+            k = cf2.number_input("Top:", min_value=5, max_value=200, value=20, step=5, key=K_FASE2 + "top")
+            prioridades = tuple(sorted(sel_prio))
+
+            # Consultas top-k sobre el orden precalculado (sin reordenar en cada rerun)
+            t0 = time.perf_counter()
+            manz = f2["manzanas"]
+            mask_zona = electoral.mascara_zona(manz, sel_loc, sel_ageb)
+            mask = mask_zona & electoral.mascara_zona(manz, "TODO EL MUNICIPIO", "TODAS", prioridades)
+            top_manz = electoral.top_k(manz, k, mask)
+            secs = f2["secciones"]
+            mask_sec = (secs['SECCION'].isin(set(manz.loc[mask_zona, 'SECCION'].dropna())) & secs['PRIORIDAD_NUM'].isin(prioridades)).to_numpy()
+            top_secs = electoral.top_k(secs, k, mask_sec)
+            t_ms = (time.perf_counter() - t0) * 1000
+
+            pob = manz.loc[mask, 'POBTOT_25'] if 'POBTOT_25' in manz.columns else pd.Series(dtype=float)
+            urgentes = mask & manz['PRIORIDAD_NUM'].isin([1, 2, 3]).to_numpy()
+            k1, k2, k3 = st.columns(3)
+            k1.metric("Polígonos en la selección", f"{int(mask.sum()):,}")
+            k2.metric("Población 2025", f"{int(pob.sum()):,}")
+            k3.metric("Polígonos Prioridad 1-3", f"{int(urgentes.sum()):,}")
+
+            c1, c2 = st.columns([3, 1])
+            with c1:
+                if not du.empty:
+                    clat, clon = get_bounds_center(du)
+                elif not dr.empty:
+                    clat, clon = get_bounds_center(dr)
+                else:
+                    clat, clon = 18.42, -95.11
+                m2 = folium.Map([clat, clon], zoom_start=13 if sel_loc != "TODO EL MUNICIPIO" else 12, tiles="CartoDB positron")
+                for capa in ["rural", "urbano"]:
+                    topo_f2 = capa_mapa_fase2(capa, sel_loc, sel_ageb, prioridades)
+                    objeto = next(iter(topo_f2["objects"]))
+                    if not topo_f2["objects"][objeto]["geometries"]: continue
+                    # Estilo leído de las columnas precalculadas (sin reglas en cada rerun)
+                    folium.TopoJson(
+                        topo_f2, f'objects.{objeto}', name=f"Estrategia ({capa})",
+                        style_function=lambda f: {'fillColor': f['properties']['COLOR_ACCION'], 'fillOpacity': f['properties']['OPACIDAD'], 'color': '#333', 'weight': 0.3},
+                        tooltip=folium.GeoJsonTooltip(fields=['NOM_LOC', 'SECCION', 'ACCION_TACTICA', 'ESTATUS'], aliases=['Localidad:', 'Sección:', 'Acción:', 'Estatus:'])
+                    ).add_to(m2)
+                st_folium(m2, height=500, width=None, returned_objects=[], key="mapa_fase2")
+            with c2:
+                st.markdown("**Acción Táctica:**")
+                st.markdown("\n".join(f"* <span class='dot' style='background-color:{color};'></span> {accion}" for accion, color, _ in electoral.ACCIONES.values()), unsafe_allow_html=True)
+
+            st.write("---")
+            st.markdown(f"#### 🎯 Top {k} Secciones")
+            cols_sec = [c for c in ['SECCION', 'ACCION_TACTICA', 'SITS_INDEX', 'POBTOT_25', 'AFECTADOS', 'N_MANZANAS', 'ESTATUS', 'MARGEN_ABS', 'LOCALIDADES'] if c in top_secs.columns]
+            st.dataframe(
+                top_secs[cols_sec].rename(columns={'ACCION_TACTICA': 'Acción', 'SITS_INDEX': 'Índice SITS', 'POBTOT_25': 'Población 2025', 'AFECTADOS': 'Afectados SITS', 'N_MANZANAS': 'Polígonos', 'MARGEN_ABS': 'Margen'}),
+                hide_index=True, use_container_width=True,
+                column_config={'SECCION': st.column_config.NumberColumn(format="%d"), 'Índice SITS': st.column_config.NumberColumn(format="percent"), 'Margen': st.column_config.NumberColumn(format="percent"), 'Población 2025': st.column_config.NumberColumn(format="%d"), 'Afectados SITS': st.column_config.NumberColumn(format="%d")}
+            )
+            st.markdown(f"#### 🏘️ Top {k} Manzanas / Localidades")
+            cols_manz = [c for c in ['CVEGEO', 'NOM_LOC', 'TIPO', 'SECCION', 'ACCION_TACTICA', 'SITS_INDEX', 'POBTOT_25', 'ESTATUS', 'MARGEN_ABS'] if c in top_manz.columns]
+            st.dataframe(
+                top_manz[cols_manz].rename(columns={'NOM_LOC': 'Localidad', 'ACCION_TACTICA': 'Acción', 'SITS_INDEX': 'Índice SITS', 'POBTOT_25': 'Población 2025', 'MARGEN_ABS': 'Margen'}),
+                hide_index=True, use_container_width=True,
+                column_config={'SECCION': st.column_config.NumberColumn(format="%d"), 'Índice SITS': st.column_config.NumberColumn(format="percent"), 'Margen': st.column_config.NumberColumn(format="percent"), 'Población 2025': st.column_config.NumberColumn(format="%d")}
+            )
+            st.caption(f"⚡ Top-{k} servido del índice ordenado ({len(manz):,} polígonos, {len(secs):,} secciones) en {t_ms:.1f} ms")
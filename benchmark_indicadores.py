@@ -0,0 +1,174 @@
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+import indicadores
+
+# ==========================================
+# BENCHMARK DEL MOTOR DE INDICADORES
+# ==========================================
+# Compara el motor (indicadores.py) contra el código anterior de
+# 'reparacion_datos_total.py' (copiado tal cual abajo) sobre un censo sintético
+# del tamaño de un estado, y verifica que den lo mismo. Diferencias esperadas,
+# que se cuentan aparte: el código anterior cambiaba POBTOT y TVIVPARHAB de 0 a
+# 1 ANTES de usarlos como numerador, así que una manzana sin población salía
+# con CAR_SALUD_20 = 1 y una sin viviendas con carencias de servicios y
+# alimentación "fantasma" (drenaje/refrigerador faltantes = 1 - conteo). El
+# motor da 0 en esos casos.
+#
+# Uso: python benchmark_indicadores.py --filas 250000 --repeticiones 5
+
+COLS_CENSO = ['POBTOT', 'P_15YMAS', 'P15YM_AN', 'P15YM_SE', 'PDER_SS',
+              'TVIVPARHAB', 'VPH_PISOTI', 'VPH_S_ELEC', 'VPH_DRENAJ', 'VPH_REFRI']
+
+
+def censo_sintetico(filas, semilla):
+    """Manzanas con conteos coherentes y texto del censo ('*', 'N/D') en ~2% de las celdas."""
+    rng = np.random.default_rng(semilla)
+    pob = rng.integers(0, 400, filas)
+    viv = rng.binomial(pob, 0.27)
+    p15 = rng.binomial(pob, 0.75)
+    df = pd.DataFrame({
+        'POBTOT': pob, 'P_15YMAS': p15,
+        'P15YM_AN': rng.binomial(p15, 0.06), 'P15YM_SE': rng.binomial(p15, 0.04),
+        'PDER_SS': rng.binomial(pob, 0.7), 'TVIVPARHAB': viv,
+        'VPH_PISOTI': rng.binomial(viv, 0.08), 'VPH_S_ELEC': rng.binomial(viv, 0.02),
+        'VPH_DRENAJ': rng.binomial(viv, 0.9), 'VPH_REFRI': rng.binomial(viv, 0.8),
+    }).astype(str)
+    for c in COLS_CENSO:
+        df.loc[rng.random(filas) < 0.02, c] = rng.choice(['*', 'N/D'])
+    return df
+
+
+# --- Código anterior (reparacion_datos_total.py antes del motor), sin cambios ---
+def limpiar_cols(df):
+    """Limpia columnas numéricas quitando asteriscos y N/A"""
+    cols_necesarias = [
+        'POBTOT', 'P_15YMAS', 'P15YM_AN', 'P15YM_SE', 'PDER_SS',
+        'TVIVPARHAB', 'VPH_PISOTIERRA', 'VPH_S_ELEC', 'VPH_DRENAJ', 'VPH_REFRI',
+        'POB_FEM', 'POB_MAS', 'P_HLI', 'POB_AFRO', 'PCON_DISC',
+        'VPH_NODREN', 'VPH_S_REFRI'
+    ]
+
+    for c in cols_necesarias:
+        if c in df.columns:
+            df[c] = pd.to_numeric(df[c], errors='coerce').fillna(0)
+    return df
+
+
+def calcular_indicadores_anterior(df):
+    """Calcula los indicadores 2020 si no existen"""
+    df = limpiar_cols(df)
+
+    # Evitar div/0
+    df['POBTOT'] = df['POBTOT'].replace(0, 1)
+    df['TVIVPARHAB'] = df['TVIVPARHAB'].replace(0, 1)
+    df['P_15YMAS'] = df['P_15YMAS'].replace(0, 1)
+
+    # Crear variables faltantes (Proxy)
+    if 'VPH_NODREN' not in df.columns:
+        if 'VPH_DRENAJ' in df.columns:
+            df['VPH_NODREN'] = (df['TVIVPARHAB'] - df['VPH_DRENAJ']).clip(lower=0)
+        else:
+            df['VPH_NODREN'] = 0
+
+    if 'VPH_S_REFRI' not in df.columns:
+        if 'VPH_REFRI' in df.columns:
+            df['VPH_S_REFRI'] = (df['TVIVPARHAB'] - df['VPH_REFRI']).clip(lower=0)
+        else:
+            df['VPH_S_REFRI'] = 0
+
+    # El censo publica piso de tierra como VPH_PISOTI
+    if 'VPH_PISOTIERRA' not in df.columns:
+        df['VPH_PISOTIERRA'] = pd.to_numeric(df['VPH_PISOTI'], errors='coerce').fillna(0) if 'VPH_PISOTI' in df.columns else 0
+    if 'VPH_S_ELEC' not in df.columns:
+        df['VPH_S_ELEC'] = 0
+
+    # Indicadores
+    df['CAR_EDU_20'] = ((df.get('P15YM_AN',0) + df.get('P15YM_SE',0)) / df['P_15YMAS']).clip(0,1)
+    df['CAR_SALUD_20'] = ((df['POBTOT'] - df.get('PDER_SS',0)) / df['POBTOT']).clip(0,1)
+    df['CAR_VIV_20'] = (df.get('VPH_PISOTIERRA',0) / df['TVIVPARHAB']).clip(0,1)
+    df['CAR_SERV_20'] = ((df.get('VPH_S_ELEC',0) + df['VPH_NODREN']) / (df['TVIVPARHAB']*2)).clip(0,1)
+    df['CAR_ALIM_20'] = (df['VPH_S_REFRI'] / df['TVIVPARHAB']).clip(0,1)
+
+    return df
+
+
+def proyecciones_anteriores(gdf):
+    """Paso 1 y 2 de generar_proyecciones_2025 anterior (carencias 2025 y SITS_INDEX)"""
+    vars_rez = ['CAR_ALIM', 'CAR_SERV', 'CAR_VIV', 'CAR_SALUD', 'CAR_EDU']
+
+    for v in vars_rez:
+        col_20 = v + "_20"
+        if col_20 in gdf.columns:
+            gdf[v] = gdf[col_20] * 0.95  # Mejora ligera
+        else:
+            gdf[v] = 0.0
+
+    gdf['SITS_INDEX'] = (
+        gdf['CAR_ALIM'] + gdf['CAR_SERV'] + gdf['CAR_VIV'] +
+        gdf['CAR_SALUD'] + gdf['CAR_EDU']
+    ) / 5.0
+    return gdf
+# --- Fin del código anterior ---
+
+
+def anterior(df):
+    return proyecciones_anteriores(calcular_indicadores_anterior(df))
+
+
+def motor(df):
+    return indicadores.evaluar(df, indicadores.TASAS_2020 + indicadores.INDICADORES_25)
+
+
+def medir(fn, df, repeticiones, copiar=False):
+    """Mediana de 'repeticiones'; con copiar=True cada corrida recibe su copia (fuera del tiempo)."""
+    tiempos = []
+    for _ in range(repeticiones):
+        entrada = df.copy() if copiar else df
+        t0 = time.perf_counter()
+        res = fn(entrada)
+        tiempos.append(time.perf_counter() - t0)
+    return float(np.median(tiempos)), res
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark del motor de indicadores SITS")
+    ap.add_argument("--filas", type=int, default=250000, help="Manzanas sintéticas (~ un estado)")
+    ap.add_argument("--repeticiones", type=int, default=5)
+    ap.add_argument("--semilla", type=int, default=2025)
+    args = ap.parse_args(argv)
+
+    print(f"⏱️ BENCHMARK DE INDICADORES: {args.filas:,} filas x {args.repeticiones} repeticiones...")
+    df = censo_sintetico(args.filas, args.semilla)
+
+    # Arreglos ya tipados (lo que recibe el simulador): mide solo la evaluación
+    tipados = indicadores.leer_columnas(df, COLS_CENSO + ['VPH_NODREN', 'VPH_S_REFRI', 'VPH_PISOTIERRA'])
+
+    # El código anterior modifica el DataFrame que recibe: se le da una copia por corrida
+    t_ref, ref = medir(anterior, df, args.repeticiones, copiar=True)
+    t_mot, res = medir(motor, df, args.repeticiones)
+    t_tip, _ = medir(motor, tipados, args.repeticiones)
+
+    conteos = indicadores.leer_columnas(df, ['POBTOT', 'TVIVPARHAB'])
+    vacias = (conteos['POBTOT'] == 0) | (conteos['TVIVPARHAB'] == 0)
+    dif = max(float(np.max(np.abs(ref[c].to_numpy()[~vacias] - res[c][~vacias]))) for c in res)
+    print(f"   Diferencia máxima contra el código anterior: {dif:.2e} (manzanas con población y viviendas)")
+    print(f"   Sin población o sin viviendas ({vacias.sum():,} manzanas), filas que cambian (intencional):")
+    for c in ['CAR_SALUD_20', 'CAR_SERV_20', 'CAR_ALIM_20', 'SITS_INDEX']:
+        print(f"      {c:<13} {int((np.abs(ref[c].to_numpy() - res[c]) > 1e-12).sum()):,}")
+
+    print("\n📊 RESULTADOS (mediana)")
+    for nombre, t in [("anterior (pandas)", t_ref), ("motor desde texto del censo", t_mot), ("motor con arreglos tipados", t_tip)]:
+        print(f"   {nombre:<30} {t * 1000:9.1f} ms   {args.filas / t / 1e6:6.2f} M filas/s")
+    print(f"\n🚀 Aceleración desde el texto del censo (scripts): {t_ref / t_mot:.1f}x")
+    print(f"   Con arreglos ya tipados (simulador, sin conversión): {t_ref / t_tip:.1f}x")
+    print("   Desde texto domina la conversión a número (pd.to_numeric), igual en ambos.")
+
+    return 0 if dif < 1e-12 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
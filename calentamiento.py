@@ -0,0 +1,145 @@
+import os
+import json
+import time
+import threading
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ==========================================
+# CALENTAMIENTO DE CACHÉS AL ARRANCAR EL SERVIDOR
+# ==========================================
+# Un hilo en segundo plano carga los datos, arma los índices y pre-calcula las
+# vistas más pedidas para que el primer usuario no pague el costo. El avance
+# se publica en ESTADO, en un archivo JSON y (opcional) en un endpoint HTTP
+# que un balanceador puede consultar antes de mandar tráfico.
+# Para calentar AL ARRANCAR hay que levantar el tablero con 'python servidor.py'.
+# Con 'streamlit run app.py' no hay dónde engancharse antes de la primera sesión:
+# app.py lo inicia en el primer rerun y ese primer visitante aún lo encuentra frío.
+
+F_ESTADO = "estado_calentamiento.json"
+PUERTO_SALUD = int(os.environ.get("SITS_PUERTO_SALUD", "0"))  # 0 = sin endpoint HTTP
+# Solo local por omisión; "0.0.0.0" lo expone al balanceador en todas las interfaces
+HOST_SALUD = os.environ.get("SITS_HOST_SALUD", "127.0.0.1")
+VISTAS_CARENCIA = ["SITS_INDEX"]
+
+ESTADO = {"fase": "EN ESPERA", "progreso": 0.0, "listo": False, "error": None, "inicio": None, "fin": None}
+_candado = threading.Lock()
+_hilo = None
+
+
+def _actualizar(**cambios):
+    with _candado:
+        ESTADO.update(cambios)
+        foto = dict(ESTADO)
+    try:
+        with open(F_ESTADO, "w", encoding="utf-8") as f:
+            json.dump(foto, f, ensure_ascii=False)
+    except OSError:
+        pass
+
+
+def estado():
+    with _candado:
+        return dict(ESTADO)
+
+
+def tareas_por_defecto():
+    """Datos, índices, análisis y, por localidad x SITS_INDEX: zona, mapa y reporte."""
+    import datos
+
+    tareas = [
+        ("Cargando capas SITS", datos.cargar_datos),
+        ("Topología urbana", datos.topo_urbano),
+        ("Base del simulador", datos.base_escenarios),
+        ("Índice espacial (STRtree)", datos.indice_espacial),
+        ("Puntos calientes (Gi*/LISA)", datos.analisis_puntos_calientes),
+    ]
+
+    def vistas():
+        # Localidades urbanas y rurales, como en el selector de la barra lateral
+        locs = [datos.TODO_MUNICIPIO] + datos.localidades()
+        return [(loc, car) for loc in locs for car in VISTAS_CARENCIA]
+
+    def render(loc, car):
+        # Lo que pide el primer rerun de cada pestaña con los filtros por omisión
+        datos.seleccion_zona(loc, datos.TODAS_AGEB)
+        datos.capa_mapa_urbana(loc, datos.TODAS_AGEB, car)
+        datos.agregados_estadistica(loc, datos.TODAS_AGEB, datos.GRUPO_POR_DEFECTO, car)
+
+    return tareas, vistas, render
+
+
+def _esperar_runtime(limite=120):
+    """Los cachés de Streamlit viven en el Runtime: calentar antes de que exista no sirve."""
+    from streamlit import runtime
+    t0 = time.time()
+    while not runtime.exists():
+        if time.time() - t0 > limite:
+            raise TimeoutError("El runtime de Streamlit no arrancó")
+        time.sleep(0.1)
+
+
+def _correr(tareas, vistas, render):
+    _actualizar(fase="ESPERANDO SERVIDOR", inicio=time.time())
+    try:
+        _esperar_runtime()
+        for i, (nombre, fn) in enumerate(tareas):
+            _actualizar(fase=nombre, progreso=i / (len(tareas) + 1))
+            print(f"🔥 [calentamiento] {nombre}...")
+            fn()
+
+        combinaciones = vistas() if vistas else []
+        base = len(tareas) / (len(tareas) + 1)
+        for j, (loc, car) in enumerate(combinaciones):
+            _actualizar(fase=f"Vista {loc} x {car}", progreso=base + (1 - base) * j / max(len(combinaciones), 1))
+            render(loc, car)
+
+        _actualizar(fase="LISTO", progreso=1.0, listo=True, fin=time.time())
+        print(f"✅ [calentamiento] Listo en {ESTADO['fin'] - ESTADO['inicio']:.1f} s ({len(combinaciones)} vistas).")
+    except Exception as e:
+        _actualizar(fase="ERROR", error=f"{type(e).__name__}: {e}", fin=time.time())
+        print(f"⚠️ [calentamiento] Falló: {e}")
+        traceback.print_exc()
+
+
+class _Salud(BaseHTTPRequestHandler):
+    """/salud responde siempre; /listo responde 503 hasta terminar el calentamiento."""
+
+    def do_GET(self):
+        foto = estado()
+        if self.path.rstrip("/") == "/listo":
+            codigo = 200 if foto["listo"] else 503
+        elif self.path.rstrip("/") == "/salud":
+            codigo = 200
+        else:
+            codigo = 404
+        cuerpo = json.dumps(foto, ensure_ascii=False).encode("utf-8")
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+
+def iniciar(puerto_salud=PUERTO_SALUD, plan=None, host_salud=HOST_SALUD):
+    """
+    Arranca el calentamiento una sola vez por proceso (llamadas repetidas no
+    hacen nada). 'plan' = (tareas, vistas, render); por defecto tareas_por_defecto().
+    Devuelve el hilo en segundo plano.
+    """
+    global _hilo
+    with _candado:
+        if _hilo is not None:
+            return _hilo
+        _hilo = threading.Thread(target=lambda: _correr(*(plan or tareas_por_defecto())), name="calentamiento", daemon=True)
+
+    if puerto_salud:
+        servidor = ThreadingHTTPServer((host_salud, puerto_salud), _Salud)
+        threading.Thread(target=servidor.serve_forever, name="salud", daemon=True).start()
+        print(f"🩺 [calentamiento] Salud en http://{host_salud}:{puerto_salud}/listo")
+
+    _hilo.start()
+    return _hilo
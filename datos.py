@@ -0,0 +1,164 @@
+import pandas as pd
+import streamlit as st
+
+import almacen as alm
+import electoral
+import escenarios
+import exportacion
+import seleccion_espacial
+import puntos_calientes
+import topologia
+
+# ==========================================
+# CARGA DE DATOS Y VISTAS CACHEADAS
+# ==========================================
+# Todo lo pesado vive aquí (y no en app.py) para que el calentamiento de
+# arranque y app.py compartan exactamente los mismos cachés del proceso.
+
+TODO_MUNICIPIO = alm.TODO_MUNICIPIO
+TODAS_AGEB = alm.TODAS_AGEB
+ZONAS_EN_CACHE = 64  # Combinaciones localidad/AGEB que se guardan por vista (las más recientes)
+
+
+@st.cache_resource
+def almacen():
+    """Archivos TopoJSON/GeoJSON o DuckDB+Parquet según SITS_ALMACEN"""
+    return alm.abrir()
+
+
+@st.cache_data
+def cargar_datos():
+    """
+    Capas completas (con geometría) del municipio configurado; None si no hay
+    datos. Solo para las vistas que necesitan todo el municipio a la vez
+    (topología del mapa, STRtree, puntos calientes). Con DuckDB se lee solo la
+    partición SITS_ENTIDAD/SITS_MUNICIPIO: la memoria crece con el municipio,
+    no con el almacén.
+    """
+    a = almacen()
+    if not a.disponible():
+        return None, None
+    return a.seleccion(TODO_MUNICIPIO, TODAS_AGEB)
+
+
+@st.cache_data
+def atributos_municipio():
+    """(du, dr) del municipio sin geometría: con DuckDB no se lee ni decodifica el WKB"""
+    return almacen().seleccion(TODO_MUNICIPIO, TODAS_AGEB, geometria=False)
+
+
+@st.cache_data
+def localidades():
+    return almacen().localidades()
+
+
+@st.cache_data(max_entries=ZONAS_EN_CACHE)
+def agebs_localidad(sel_loc):
+    return almacen().agebs(sel_loc)
+
+
+@st.cache_data(max_entries=ZONAS_EN_CACHE)
+def seleccion_zona(sel_loc, sel_ageb):
+    """(du, dr) de la zona: solo se traen las geometrías seleccionadas"""
+    return almacen().seleccion(sel_loc, sel_ageb)
+
+
+@st.cache_data(max_entries=ZONAS_EN_CACHE)
+def agregados_zona(sel_loc, sel_ageb, sumas=(), productos=()):
+    """Sumas simples y ponderadas de la zona resueltas por el almacén"""
+    return almacen().agregados(sel_loc, sel_ageb, sumas, productos)
+
+
+# Columnas del reporte de la pestaña de estadística. La pestaña y el calentamiento
+# piden los agregados con agregados_estadistica: mismos argumentos, misma entrada de caché
+METRICAS_ESTADISTICA = ['CAR_ALIM', 'CAR_SERV', 'CAR_VIV', 'CAR_SALUD', 'CAR_EDU']
+DISC_ESTADISTICA = ['DISC_MOTRIZ_25', 'DISC_VISUAL_25', 'DISC_AUDITIVA_25', 'DISC_MENTAL_25']
+EDAD_ESTADISTICA = ['POB_NINOS_25', 'POB_ADULTOS_25', 'POB_MAYORES_25']
+GRUPO_POR_DEFECTO = "POBTOT_25"  # Primera opción del selector de grupo poblacional
+
+
+def agregados_estadistica(sel_loc, sel_ageb, col_focalizada, carencia):
+    """Sumas y productos del reporte de estadística para el grupo y la carencia elegidos"""
+    return agregados_zona(
+        sel_loc, sel_ageb,
+        sumas=tuple([col_focalizada, 'POB_FEM_25'] + DISC_ESTADISTICA + EDAD_ESTADISTICA),
+        productos=tuple((col_focalizada, c) for c in [carencia] + METRICAS_ESTADISTICA)
+    )
+
+
+@st.cache_resource
+def base_escenarios():
+    """Arreglos del simulador (conteos crudos) construidos una sola vez por proceso"""
+    u, r = atributos_municipio()
+    return escenarios.preparar_base(pd.concat([u, r], ignore_index=True))
+
+
+@st.cache_resource
+def indice_espacial():
+    """STRtree sobre todas las geometrías SITS (urbanas + rurales) en metros"""
+    u, r = cargar_datos()
+    return seleccion_espacial.construir_indice(pd.concat([u, r], ignore_index=True))
+
+
+@st.cache_resource
+def topo_urbano():
+    """Topología cuantizada de las manzanas: base de la carga útil que se envía al navegador"""
+    u, _ = cargar_datos()
+    return topologia.codificar(u.drop(columns=['TIPO']), 'urbano')
+
+
+@st.cache_data(max_entries=ZONAS_EN_CACHE)
+def capa_mapa_urbana(sel_loc, sel_ageb, carencia):
+    """
+    TopoJSON de las manzanas de la zona con solo los campos del mapa. Es
+    cache_data a propósito: cada llamada recibe su copia y folium puede
+    escribirle estilos sin tocar la versión cacheada.
+    """
+    u, _ = seleccion_zona(sel_loc, sel_ageb)
+    return topologia.subconjunto(topo_urbano(), 'urbano', u['CVEGEO'], campos=['CVEGEO', 'NOM_LOC', 'CVE_AGEB', carencia])
+
+
+def exportar_seleccion(formato, sel_loc, sel_ageb, fraccion=None):
+    """
+    GeoPackage/FlatGeobuf de la zona, o solo de las CVEGEO de una figura dibujada
+    ('fraccion' = {CVEGEO: fracción cubierta}). Se escribe por lotes desde el
+    almacén y no se cachea: los bytes solo viven mientras se descargan.
+    """
+    a = almacen()
+    claves = set(fraccion) if fraccion is not None else None
+    fuentes = [(a.lotes(capa, sel_loc, sel_ageb, claves), a.esquema(capa)) for capa in alm.CAPAS]
+    return exportacion.exportar_bytes(fuentes, formato, {'FRACCION': fraccion} if fraccion is not None else None)
+
+
+@st.cache_data
+def analisis_puntos_calientes():
+    """Gi*/LISA para SITS_INDEX y cada CAR_* (los pesos espaciales se cachean en disco)"""
+    u, r = cargar_datos()
+    return puntos_calientes.analizar(pd.concat([u, r], ignore_index=True))
+
+
+# ==========================================
+# FASE 2 (ELECTORAL): CARGA PEREZOSA
+# ==========================================
+# Separado de cargar_datos() y fuera del calentamiento: solo se lee cuando
+# alguien abre la pestaña de fase 2, así las pestañas sociales no pagan su memoria.
+
+def fase2():
+    """Topologías, manzanas y secciones ordenadas por prioridad (None si no existen)"""
+    # Se revisa antes de cachear: si el script corre después, no queda un None guardado
+    return _fase2() if electoral.disponible() else None
+
+
+@st.cache_resource
+def _fase2():
+    return electoral.cargar()
+
+
+@st.cache_data(max_entries=ZONAS_EN_CACHE)
+def capa_mapa_fase2(capa, sel_loc, sel_ageb, prioridades):
+    """TopoJSON de la zona con los campos de estilo ya calculados (copia por llamada)"""
+    f2 = fase2()
+    m = f2["manzanas"]
+    claves = m.loc[electoral.mascara_zona(m, sel_loc, sel_ageb, prioridades) & (m['TIPO'] == electoral.TIPOS[capa]).to_numpy(), 'CVEGEO']
+    topo = f2["topo"][capa]
+    return topologia.subconjunto(topo, next(iter(topo["objects"])), claves, campos=electoral.COLS_MAPA)
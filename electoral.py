@@ -0,0 +1,147 @@
+import os
+import numpy as np
+import pandas as pd
+
+import topologia
+
+# ==========================================
+# FASE 2: ESTRATEGIA ELECTORAL-SOCIAL
+# ==========================================
+# Capas de 'preparar_electoral_fase2.py' para la pestaña de estrategia. El
+# estilo del mapa viene precalculado en columnas (COLOR_ACCION, OPACIDAD) y
+# las tablas top-k salen de un orden fijo (PRIORIDAD_NUM, luego SITS_INDEX)
+# calculado una sola vez al cargar: cada rerun solo filtra y toma k filas.
+
+F_FASE2 = {"urbano": "sits_urbano_fase2.geojson", "rural": "sits_rural_fase2.geojson"}
+
+# PRIORIDAD_NUM -> (ACCION_TACTICA, color, opacidad)
+ACCIONES = {
+    1: ("1. GUERRA SOCIAL (Empate + Pobreza Alta)", '#800026', 0.85),
+    2: ("2. BLINDAJE (Ganada + Pobreza Alta)", '#e31a1c', 0.80),
+    3: ("3. OPORTUNIDAD (Perdida + Pobreza Extrema)", '#fd8d3c', 0.80),
+    4: ("4. GUERRA ELECTORAL (Empate + Clase Media)", '#6a51a3', 0.60),
+    5: ("5. MANTENIMIENTO (Ganada + Clase Media)", '#41ab5d', 0.45),
+    6: ("6. ZONA PERDIDA", '#969696', 0.35),
+    7: ("SIN CLASIFICAR", '#d9d9d9', 0.20),
+}
+PRIORIDAD_SIN_DATO = 7
+TIPOS = {"urbano": "Urbano", "rural": "Rural"}
+
+COLS_TABLA = ['CVEGEO', 'NOM_LOC', 'CVE_AGEB', 'TIPO', 'SECCION', 'ACCION_TACTICA', 'PRIORIDAD_NUM',
+              'SITS_INDEX', 'POBTOT_25', 'ESTATUS', 'MARGEN_ABS', 'SENSIBILIDAD']
+COLS_MAPA = ['CVEGEO', 'NOM_LOC', 'SECCION', 'ACCION_TACTICA', 'ESTATUS', 'COLOR_ACCION', 'OPACIDAD']
+
+
+def _num(df, col, default=0.0):
+    if col in df.columns:
+        return pd.to_numeric(df[col], errors='coerce').fillna(default)
+    return pd.Series(default, index=df.index, dtype=np.float64)
+
+
+def columnas_estilo(df):
+    """COLOR_ACCION y OPACIDAD por PRIORIDAD_NUM (se guardan con la capa)."""
+    prio = _num(df, 'PRIORIDAD_NUM', PRIORIDAD_SIN_DATO).astype(int)
+    return df.assign(
+        COLOR_ACCION=prio.map({p: v[1] for p, v in ACCIONES.items()}).fillna(ACCIONES[PRIORIDAD_SIN_DATO][1]),
+        OPACIDAD=prio.map({p: v[2] for p, v in ACCIONES.items()}).fillna(ACCIONES[PRIORIDAD_SIN_DATO][2]),
+    )
+
+
+def ordenar_prioridad(df):
+    """Filas ordenadas por PRIORIDAD_NUM (asc) y SITS_INDEX (desc), índice 0..n-1."""
+    prio = _num(df, 'PRIORIDAD_NUM', PRIORIDAD_SIN_DATO).to_numpy()
+    sits = _num(df, 'SITS_INDEX').to_numpy()
+    orden = np.lexsort((-sits, prio))
+    return df.iloc[orden].reset_index(drop=True)
+
+
+def resumen_secciones(manzanas):
+    """
+    Una fila por sección electoral: la acción más urgente presente en ella,
+    SITS_INDEX ponderado por población y población afectada.
+    """
+    df = manzanas[manzanas['SECCION'].notna()].assign(
+        POB=_num(manzanas, 'POBTOT_25'),
+        PRIO=_num(manzanas, 'PRIORIDAD_NUM', PRIORIDAD_SIN_DATO),
+    )
+    df['AFECTADOS'] = _num(df, 'SITS_INDEX') * df['POB']
+    g = df.groupby('SECCION', sort=False)
+    sec = pd.DataFrame({
+        'PRIORIDAD_NUM': g['PRIO'].min(),
+        'POBTOT_25': g['POB'].sum(),
+        'AFECTADOS': g['AFECTADOS'].sum(),
+        'N_MANZANAS': g.size(),
+        'LOCALIDADES': g['NOM_LOC'].agg(lambda s: ", ".join(sorted(s.astype(str).unique()))),
+    })
+    for c in ['ESTATUS', 'MARGEN_ABS', 'SENSIBILIDAD']:
+        if c in df.columns: sec[c] = g[c].first()
+    sec['SITS_INDEX'] = np.where(sec['POBTOT_25'] > 0, sec['AFECTADOS'] / sec['POBTOT_25'].where(sec['POBTOT_25'] > 0, 1), 0.0)
+    sec['ACCION_TACTICA'] = sec['PRIORIDAD_NUM'].astype(int).map({p: v[0] for p, v in ACCIONES.items()})
+    return ordenar_prioridad(sec.reset_index())
+
+
+def _leer(ruta):
+    """(topo, atributos) de la capa; el GeoJSON viejo se convierte a topología al vuelo."""
+    destino = topologia.ruta_topojson(ruta)
+    if os.path.exists(destino):
+        topo = topologia.leer_json(destino)
+    elif os.path.exists(ruta):
+        gdf = topologia.leer_capa(ruta)
+        topo = topologia.codificar(gdf, os.path.splitext(os.path.basename(ruta))[0])
+    else:
+        return None, None
+    nombre = next(iter(topo["objects"]))
+    atributos = topologia.atributos(topo, nombre)
+
+    # Capas generadas antes de guardar el estilo: se agrega a la topología
+    if 'COLOR_ACCION' not in atributos.columns:
+        atributos = columnas_estilo(atributos)
+        objeto = topo["objects"][nombre]
+        for c in ['COLOR_ACCION', 'OPACIDAD']:
+            if "columnas" in objeto:
+                objeto["columnas"][c] = atributos[c].tolist()
+            else:
+                for g, v in zip(objeto["geometries"], atributos[c].tolist()):
+                    g.setdefault("properties", {})[c] = v
+    return topo, atributos
+
+
+def disponible(rutas=F_FASE2):
+    return all(os.path.exists(r) or os.path.exists(topologia.ruta_topojson(r)) for r in rutas.values())
+
+
+def cargar(rutas=F_FASE2):
+    """
+    Topologías (para el mapa), manzanas y secciones ya ordenadas por prioridad.
+    None si no se ha corrido 'preparar_electoral_fase2.py'.
+    """
+    topos, partes = {}, []
+    for capa, ruta in rutas.items():
+        topo, attrs = _leer(ruta)
+        if topo is None:
+            return None
+        topos[capa] = topo
+        attrs['TIPO'] = TIPOS[capa]
+        partes.append(attrs[[c for c in COLS_TABLA if c in attrs.columns]])
+
+    manzanas = ordenar_prioridad(pd.concat(partes, ignore_index=True))
+    return {"topo": topos, "manzanas": manzanas, "secciones": resumen_secciones(manzanas)}
+
+
+def mascara_zona(manzanas, sel_loc, sel_ageb="TODAS", prioridades=None):
+    """Filas de la zona (mismo criterio que los filtros de app.py) y de las acciones elegidas."""
+    m = np.ones(len(manzanas), dtype=bool)
+    if sel_loc != "TODO EL MUNICIPIO":
+        m &= (manzanas['NOM_LOC'] == sel_loc).to_numpy()
+    if sel_ageb != "TODAS":
+        m &= ((manzanas['CVE_AGEB'] == sel_ageb) | (manzanas['TIPO'] == "Rural")).to_numpy()
+    if prioridades is not None:
+        m &= _num(manzanas, 'PRIORIDAD_NUM', PRIORIDAD_SIN_DATO).isin(prioridades).to_numpy()
+    return m
+
+
+def top_k(ordenadas, k, mascara=None):
+    """Las k primeras filas que cumplen la máscara: el orden ya viene hecho."""
+    if mascara is None:
+        return ordenadas.head(k)
+    return ordenadas.iloc[np.flatnonzero(mascara)[:k]]
@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+
+import indicadores
+
+# ==========================================
+# SIMULADOR DE ESCENARIOS ("¿QUÉ PASA SI...?")
+# ==========================================
+# Recalcula CAR_VIV, CAR_SERV, CAR_ALIM y SITS_INDEX a partir de los conteos
+# crudos de vivienda guardados por 'reparacion_datos_total.py', sin volver a
+# correr el pipeline. Las fórmulas son las del motor único (indicadores.py),
+# evaluado sobre arreglos NumPy en una sola pasada.
+
+FACTOR_MEJORA_25 = indicadores.FACTOR_MEJORA_25
+
+# Palancas de intervención -> columna de conteo (viviendas con la carencia)
+PALANCAS = {
+    'PISO': ('VPH_PISOTIERRA', "🏠 Pisos de tierra"),
+    'DREN': ('VPH_NODREN', "🚰 Sin drenaje"),
+    'LUZ': ('VPH_S_ELEC', "💡 Sin electricidad"),
+    'REFRI': ('VPH_S_REFRI', "🧊 Sin refrigerador"),
+}
+
+# Capas sin conteos crudos: solo hay la tasa CAR_SERV (luz y drenaje juntos), así
+# que no se puede mover uno sin el otro. La palanca SERV lleva el numerador
+# completo de CAR_SERV en la columna de luz (el drenaje queda en 0).
+PALANCAS_AGREGADAS = {
+    'PISO': PALANCAS['PISO'],
+    'SERV': ('VPH_S_ELEC', "🚰💡 Servicios (drenaje + luz)"),
+    'REFRI': PALANCAS['REFRI'],
+}
+
+INDICADORES_SIM = ['CAR_VIV', 'CAR_SERV', 'CAR_ALIM', 'SITS_INDEX']
+
+
+def _num(df, col, default=0.0):
+    if col in df.columns:
+        return pd.to_numeric(df[col], errors='coerce').fillna(default).to_numpy(dtype=np.float64)
+    return np.full(len(df), default, dtype=np.float64)
+
+
+def _tasa_20(df, col):
+    """Tasa 2020; si no existe se deshace la proyección 2025."""
+    if col + '_20' in df.columns:
+        return _num(df, col + '_20')
+    return _num(df, col) / FACTOR_MEJORA_25
+
+
+def preparar_base(df):
+    """
+    Extrae los arreglos que necesita el simulador (una sola vez, para cachear).
+    Si la capa no trae conteos crudos (versiones viejas del pipeline) se usan
+    las tasas 2020 con denominador 1 y las palancas de PALANCAS_AGREGADAS:
+    drenaje y luz no se pueden separar. base['palancas'] dice cuáles aplican.
+    """
+    df = df.reset_index(drop=True)
+    base = {
+        'NOM_LOC': df['NOM_LOC'].astype(str).to_numpy(),
+        'CVE_AGEB': df['CVE_AGEB'].fillna('').astype(str).to_numpy() if 'CVE_AGEB' in df.columns else np.full(len(df), '', dtype=object),
+        'RURAL': (df['TIPO'] == 'Rural').to_numpy() if 'TIPO' in df.columns else np.zeros(len(df), dtype=bool),
+        'POBTOT_25': _num(df, 'POBTOT_25'),
+        'CAR_SALUD': _num(df, 'CAR_SALUD'),
+        'CAR_EDU': _num(df, 'CAR_EDU'),
+    }
+
+    if all(c in df.columns for c, _ in PALANCAS.values()) and 'TVIVPARHAB' in df.columns:
+        base['palancas'] = PALANCAS
+        base['VIV'] = np.maximum(_num(df, 'TVIVPARHAB'), 1.0)
+        for k, (col, _) in PALANCAS.items():
+            base[k] = _num(df, col)
+    else:
+        # CAR_SERV_20 = (luz + drenaje) / (2·viv): con viv = 1 el numerador es 2·tasa
+        base['palancas'] = PALANCAS_AGREGADAS
+        base['VIV'] = np.ones(len(df), dtype=np.float64)
+        base['PISO'] = _tasa_20(df, 'CAR_VIV')
+        base['SERV'] = 2 * _tasa_20(df, 'CAR_SERV')
+        base['REFRI'] = _tasa_20(df, 'CAR_ALIM')
+
+    return base
+
+
+def mascara_zona(base, sel_loc, sel_ageb="TODAS"):
+    """Filas donde se aplica la intervención (mismo criterio que los filtros de app.py)."""
+    m = np.ones(len(base['NOM_LOC']), dtype=bool)
+    if sel_loc != "TODO EL MUNICIPIO":
+        m &= base['NOM_LOC'] == sel_loc
+    if sel_ageb != "TODAS":
+        m &= (base['CVE_AGEB'] == sel_ageb) | base['RURAL']
+    return m
+
+
+def simular(base, mascara, reducciones):
+    """
+    Aplica las reducciones (fracción 0-1 de viviendas atendidas por palanca)
+    dentro de la máscara y devuelve los indicadores 2025 recalculados.
+    """
+    datos = {'TVIVPARHAB': base['VIV'], 'CAR_SALUD': base['CAR_SALUD'], 'CAR_EDU': base['CAR_EDU']}
+    for k, (col, _) in base['palancas'].items():
+        r = float(reducciones.get(k, 0.0))
+        datos[col] = base[k] * np.where(mascara, 1.0 - r, 1.0) if r else base[k]
+
+    # CAR_SALUD y CAR_EDU no dependen de las palancas: entran tal cual al SITS_INDEX
+    return indicadores.evaluar(datos, INDICADORES_SIM)
+
+
+def comparar(base, linea_base, escenario, mascara=None):
+    """Tabla de personas afectadas (ponderadas por POBTOT_25): base vs escenario."""
+    pob = base['POBTOT_25'] if mascara is None else np.where(mascara, base['POBTOT_25'], 0.0)
+    total = pob.sum()
+    filas = []
+    for ind in INDICADORES_SIM:
+        a0 = float(linea_base[ind] @ pob)
+        a1 = float(escenario[ind] @ pob)
+        filas.append({
+            "Indicador": ind,
+            "Afectados Base": a0,
+            "Afectados Escenario": a1,
+            "Diferencia": a1 - a0,
+            "% Base": (a0 / total * 100) if total > 0 else 0,
+            "% Escenario": (a1 / total * 100) if total > 0 else 0,
+        })
+    return pd.DataFrame(filas)
@@ -0,0 +1,91 @@
+import os
+import tempfile
+import itertools
+import pandas as pd
+import pyarrow as pa
+import shapely
+
+# ==========================================
+# EXPORTACIÓN GEOESPACIAL (GEOPACKAGE / FLATGEOBUF)
+# ==========================================
+# Escribe la selección (zona de los filtros o figura dibujada) con geometrías y
+# atributos para el equipo SIG. Los registros llegan por lotes del almacén y se
+# pasan a GDAL como un flujo Arrow: un solo archivo abierto, memoria de la
+# escritura acotada a un lote y el índice espacial (R-tree en GPKG, Hilbert en
+# FGB) se arma dentro del archivo al cerrarlo.
+# La descarga sí carga el archivo terminado completo en RAM: st.download_button
+# convierte a bytes cualquier dato (también un archivo abierto) y su gestor de
+# medios guarda esa copia mientras la sesión la necesite.
+
+FORMATOS = {
+    "GeoPackage": {"driver": "GPKG", "ext": ".gpkg", "mime": "application/geopackage+sqlite3"},
+    "FlatGeobuf": {"driver": "FlatGeobuf", "ext": ".fgb", "mime": "application/octet-stream"},
+}
+CAPA = "sits"
+
+
+def _esquema(esquemas, extra):
+    """Esquema común a todas las capas (columnas de todas; tipos promovidos)."""
+    esquema = pa.unify_schemas(esquemas, promote_options="permissive")
+    # Columnas vacías en toda la capa: GDAL necesita un tipo concreto
+    campos = [pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f for f in esquema]
+    campos += [pa.field(c, pa.float64()) for c in extra if c not in esquema.names]
+    return pa.schema(campos)
+
+
+def _multi(geoms):
+    """Polygon -> MultiPolygon vectorizado (una sola geometría por tipo de capa)."""
+    partes, idx = shapely.get_parts(geoms, return_index=True)
+    return shapely.multipolygons(partes, indices=idx)
+
+
+def _lotes_arrow(iteradores, esquema, extra):
+    for lote in itertools.chain.from_iterable(iteradores):
+        attrs = pd.DataFrame(lote.drop(columns=lote.geometry.name))
+        for c, valores in extra.items():
+            attrs[c] = attrs['CVEGEO'].map(valores)
+        tabla = pa.Table.from_pandas(attrs.reindex(columns=esquema.names), schema=esquema, preserve_index=False)
+        wkb = shapely.to_wkb(_multi(lote.geometry.to_crs("EPSG:4326").values))
+        yield from tabla.append_column("geometry", pa.array(wkb, type=pa.binary())).combine_chunks().to_batches()
+
+
+def escribir(fuentes, ruta, formato="GeoPackage", extra=None):
+    """
+    Escribe en 'ruta' los lotes (GeoDataFrames) de cada fuente; una fuente por
+    capa del almacén: (lotes, esquema de sus atributos). El esquema viene del
+    almacén y se fija antes del primer lote; cada lote se convierte a él.
+    'extra' = {columna: {CVEGEO: valor}} para agregar campos (p.ej. la fracción
+    cubierta por una figura). Devuelve el número de registros.
+    """
+    import pyogrio
+
+    extra = extra or {}
+    iteradores, esquemas = zip(*fuentes)
+    esquema = _esquema(esquemas, extra)
+    total = [0]
+
+    def contar(lotes):
+        for rb in lotes:
+            total[0] += rb.num_rows
+            yield rb
+
+    esquema_geo = esquema.append(pa.field("geometry", pa.binary()))
+    lector = pa.RecordBatchReader.from_batches(esquema_geo, contar(_lotes_arrow(iteradores, esquema, extra)))
+    pyogrio.write_arrow(
+        lector, ruta, layer=CAPA, driver=FORMATOS[formato]["driver"],
+        geometry_name="geometry", geometry_type="MultiPolygon", crs="EPSG:4326",
+        layer_options={"SPATIAL_INDEX": "YES"},
+    )
+    return total[0]
+
+
+def exportar_bytes(fuentes, formato="GeoPackage", extra=None):
+    """
+    Escribe en un archivo temporal y devuelve su contenido (para st.download_button).
+    El resultado ocupa en memoria el tamaño del archivo completo.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta = os.path.join(tmp, CAPA + FORMATOS[formato]["ext"])
+        escribir(fuentes, ruta, formato, extra)
+        with open(ruta, "rb") as f:
+            return f.read()
@@ -0,0 +1,158 @@
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# MOTOR DE INDICADORES (DEFINICIÓN ÚNICA)
+# ==========================================
+# Las carencias y el SITS_INDEX se definen UNA sola vez, como datos. Cada
+# indicador es:  recorte( factor * Σ(coef·num) / Σ(coef·den) )
+# donde num/den pueden ser columnas del censo u otros indicadores. La definición
+# se compila (una vez) en matrices de coeficientes por etapa y se evalúa con
+# productos matriciales sobre un solo arreglo float64: sin copias del DataFrame
+# ni replace(0, 1) repetidos. Lo usan los scripts de preparación y el simulador.
+
+FACTOR_MEJORA_25 = 0.95  # Proyección 2025 de las carencias (mejora ligera del 5%)
+
+# Conteos que el censo no siempre publica: se derivan solo si existen TODAS sus
+# columnas de origen (si no, valen 0). El resultado se recorta a >= 0.
+DERIVADAS = {
+    'VPH_NODREN': {'TVIVPARHAB': 1, 'VPH_DRENAJ': -1},
+    'VPH_S_REFRI': {'TVIVPARHAB': 1, 'VPH_REFRI': -1},
+    'VPH_PISOTIERRA': {'VPH_PISOTI': 1},   # El censo publica piso de tierra como VPH_PISOTI
+}
+
+# Columnas de denominador en 0 -> 1 (sin denominador -> 1). Columnas ausentes -> 0.
+DEFINICION = {
+    # --- Tasas 2020 (censo) ---
+    'CAR_EDU_20':   {'num': {'P15YM_AN': 1, 'P15YM_SE': 1}, 'den': {'P_15YMAS': 1}, 'recorte': (0, 1)},
+    'CAR_SALUD_20': {'num': {'POBTOT': 1, 'PDER_SS': -1}, 'den': {'POBTOT': 1}, 'recorte': (0, 1)},
+    'CAR_VIV_20':   {'num': {'VPH_PISOTIERRA': 1}, 'den': {'TVIVPARHAB': 1}, 'recorte': (0, 1)},
+    'CAR_SERV_20':  {'num': {'VPH_S_ELEC': 1, 'VPH_NODREN': 1}, 'den': {'TVIVPARHAB': 2}, 'recorte': (0, 1)},
+    'CAR_ALIM_20':  {'num': {'VPH_S_REFRI': 1}, 'den': {'TVIVPARHAB': 1}, 'recorte': (0, 1)},
+    'IND_JEFAS':    {'num': {'HOGJEF_F': 1}, 'den': {'TOTHOG': 1}, 'recorte': (None, 1)},
+
+    # --- Proyección 2025 ---
+    'CAR_ALIM':  {'num': {'CAR_ALIM_20': 1}, 'factor': FACTOR_MEJORA_25},
+    'CAR_SERV':  {'num': {'CAR_SERV_20': 1}, 'factor': FACTOR_MEJORA_25},
+    'CAR_VIV':   {'num': {'CAR_VIV_20': 1}, 'factor': FACTOR_MEJORA_25},
+    'CAR_SALUD': {'num': {'CAR_SALUD_20': 1}, 'factor': FACTOR_MEJORA_25},
+    'CAR_EDU':   {'num': {'CAR_EDU_20': 1}, 'factor': FACTOR_MEJORA_25},
+
+    # --- Índice multidimensional (promedio simple de las carencias 2025) ---
+    'SITS_INDEX': {'num': {'CAR_ALIM': 1, 'CAR_SERV': 1, 'CAR_VIV': 1, 'CAR_SALUD': 1, 'CAR_EDU': 1}, 'factor': 1 / 5},
+}
+
+TASAS_2020 = ('CAR_EDU_20', 'CAR_SALUD_20', 'CAR_VIV_20', 'CAR_SERV_20', 'CAR_ALIM_20')
+INDICADORES_25 = ('CAR_ALIM', 'CAR_SERV', 'CAR_VIV', 'CAR_SALUD', 'CAR_EDU', 'SITS_INDEX')
+
+
+@lru_cache(maxsize=64)
+def compilar(salidas, disponibles=frozenset()):
+    """
+    Plan de evaluación para 'salidas'. Los indicadores que ya vienen en los datos
+    ('disponibles') y no se piden como salida se leen en vez de recalcularse.
+    """
+    nivel, entradas = {}, []
+
+    def resolver(nombre, pila=()):
+        if nombre in nivel:
+            return nivel[nombre]
+        if nombre in pila:
+            raise ValueError(f"Definición circular en {nombre}")
+        if nombre not in DEFINICION or (nombre in disponibles and nombre not in salidas):
+            nivel[nombre] = 0
+            entradas.append(nombre)
+            return 0
+        d = DEFINICION[nombre]
+        deps = list(d['num']) + list(d.get('den', {}))
+        nivel[nombre] = 1 + max((resolver(c, pila + (nombre,)) for c in deps), default=0)
+        return nivel[nombre]
+
+    for s in salidas:
+        resolver(s)
+
+    calculados = sorted((n for n, l in nivel.items() if l > 0), key=nivel.get)
+    posicion = {n: i for i, n in enumerate(entradas + calculados)}
+
+    etapas, k = [], len(entradas)
+    for l in range(1, max(nivel.values(), default=0) + 1):
+        nombres = [n for n in calculados if nivel[n] == l]
+        A = np.zeros((k, len(nombres)))
+        B = np.zeros((k, len(nombres)))
+        for j, n in enumerate(nombres):
+            d = DEFINICION[n]
+            for c, coef in d['num'].items(): A[posicion[c], j] += coef
+            for c, coef in d.get('den', {}).items(): B[posicion[c], j] += coef
+        filas_den = np.flatnonzero(B.any(axis=1))
+        lo, hi = zip(*(DEFINICION[n].get('recorte', (None, None)) for n in nombres))
+        etapas.append({
+            'inicio': k, 'A': A.T.copy(), 'B': B[filas_den].T.copy(), 'filas_den': filas_den,
+            'factor': np.array([[DEFINICION[n].get('factor', 1.0)] for n in nombres]),
+            'min': np.array([[-np.inf if v is None else v] for v in lo], dtype=np.float64),
+            'max': np.array([[np.inf if v is None else v] for v in hi], dtype=np.float64),
+        })
+        k += len(nombres)
+
+    return {'entradas': tuple(entradas), 'etapas': etapas, 'posicion': posicion}
+
+
+def _largo(datos):
+    return len(datos) if isinstance(datos, pd.DataFrame) else len(next(iter(datos.values()), ()))
+
+
+def _columna(datos, c, n, leidas):
+    """Columna como float64 (texto del censo como '*' o 'N/D' -> 0), derivándola si hace falta."""
+    if c in leidas:
+        return leidas[c]
+    if c in datos:
+        v = datos[c]
+        if isinstance(v, pd.Series):
+            if v.dtype == object:
+                v = pd.to_numeric(v, errors='coerce')
+            v = v.to_numpy(dtype=np.float64, na_value=0.0)
+        else:
+            v = np.asarray(v, dtype=np.float64)
+        leidas[c] = v if not np.isnan(v).any() else np.nan_to_num(v)
+        return leidas[c]
+    fuentes = DERIVADAS.get(c)
+    if fuentes and all(f in datos for f in fuentes):
+        leidas[c] = np.maximum(sum(coef * _columna(datos, f, n, leidas) for f, coef in fuentes.items()), 0.0)
+    else:
+        leidas[c] = np.zeros(n, dtype=np.float64)
+    return leidas[c]
+
+
+def leer_columnas(datos, columnas):
+    """Columnas numéricas (con las derivadas aplicadas) como arreglos float64."""
+    n, leidas = _largo(datos), {}
+    return {c: _columna(datos, c, n, leidas) for c in columnas}
+
+
+def evaluar(datos, salidas=INDICADORES_25):
+    """
+    Calcula 'salidas' sobre un DataFrame o un dict de arreglos en una sola
+    pasada. Devuelve {indicador: arreglo float64}; 'datos' no se modifica.
+    """
+    salidas = tuple(salidas)
+    plan = compilar(salidas, frozenset(c for c in DEFINICION if c in datos))
+    n = _largo(datos)
+
+    # Un solo bloque con una fila contigua por variable: entradas y luego cada etapa
+    X = np.empty((len(plan['posicion']), n), dtype=np.float64)
+    leidas = {}
+    for i, c in enumerate(plan['entradas']):
+        X[i] = _columna(datos, c, n, leidas)
+
+    for e in plan['etapas']:
+        previas = X[:e['inicio']]
+        num = e['A'] @ previas
+        den = previas[e['filas_den']]
+        den = e['B'] @ np.where(den == 0, 1.0, den)
+        den[den == 0] = 1.0
+        np.divide(num, den, out=num)
+        num *= e['factor']
+        np.clip(num, e['min'], e['max'], out=num)
+        X[e['inicio']:e['inicio'] + len(num)] = num
+
+    return {s: X[plan['posicion'][s]] for s in salidas}
@@ -3,6 +3,9 @@ import geopandas as gpd
 import numpy as np
 import os
 import warnings
+from topologia import guardar_capa, leer_capa
+from electoral import ACCIONES, columnas_estilo
+from validacion import Reporte
 
 warnings.filterwarnings("ignore")
 
@@ -19,6 +22,9 @@ F_MAPA_SEC = 'datos_crudos/SECCION.shp'
 F_SITS_U = 'sits_urbano_oficial.geojson'
 F_SITS_R = 'sits_rural_oficial.geojson'
 
+# Validación después de cada paso: se detiene antes de guardar capas malas
+reporte = Reporte("preparar_electoral_fase2")
+
 # 1. CARGA Y LIMPIEZA DE VOTOS (Igual que antes)
 def cargar_votos(ruta, etiqueta):
     if not os.path.exists(ruta): return pd.DataFrame()
@@ -82,12 +88,29 @@ gdf_sec = gpd.read_file(F_MAPA_SEC)
 if gdf_sec.crs != "EPSG:4326": gdf_sec = gdf_sec.to_crs("EPSG:4326")
 col_sec_map = [c for c in gdf_sec.columns if 'SECCION' in c.upper()][0]
 gdf_sec['seccion_fix'] = pd.to_numeric(gdf_sec[col_sec_map])
+
+# El mapa de secciones es estatal: la cobertura se mide desde los resultados.
+# Secciones encimadas le darían dos secciones a una manzana en el sjoin.
+reporte.etapa("secciones: mapa y resultados")
+gdf_sec = reporte.geometrias("secciones", gdf_sec)
+reporte.cruce("secciones", "resultados 2025", base['SECCION'], gdf_sec['seccion_fix'])
 gdf_data = gdf_sec.merge(base, left_on='seccion_fix', right_on='SECCION')
+reporte.traslapes("secciones", gdf_data)
+reporte.huecos("secciones", gdf_data)
+reporte.verificar()
 if 'SECCION' not in gdf_data.columns: gdf_data['SECCION'] = gdf_data['seccion_fix']
 
 # Cargar SITS FASE 1 (Aquí vienen las Jefas, Indígenas, etc.)
-u = gpd.read_file(F_SITS_U)
-r = gpd.read_file(F_SITS_R)
+u = leer_capa(F_SITS_U)
+r = leer_capa(F_SITS_R)
+
+reporte.etapa("fase 1: capas SITS")
+for capa, gdf, largo in [("urbano", u, 16), ("rural", r, 9)]:
+    reporte.claves(capa, gdf['CVEGEO'], largo=largo)
+u = reporte.geometrias("urbano", u)
+r = reporte.geometrias("rural", r)
+reporte.traslapes("rural", r, otra=u, capa_otra="urbano")
+reporte.verificar()
 
 def inyectar(gdf_puntos, gdf_poly):
     # Preservamos TODAS las columnas sociales originales
@@ -125,22 +148,23 @@ def inyectar(gdf_puntos, gdf_poly):
     gdf_puntos['ACCION_TACTICA'] = gdf_puntos.apply(definir, axis=1)
     
     # ID de Prioridad para ordenar tablas
-    prio_map = {
-        "1. GUERRA SOCIAL (Empate + Pobreza Alta)": 1,
-        "2. BLINDAJE (Ganada + Pobreza Alta)": 2,
-        "3. OPORTUNIDAD (Perdida + Pobreza Extrema)": 3,
-        "4. GUERRA ELECTORAL (Empate + Clase Media)": 4,
-        "5. MANTENIMIENTO (Ganada + Clase Media)": 5,
-        "6. ZONA PERDIDA": 6
-    }
+    prio_map = {accion: prio for prio, (accion, _, _) in ACCIONES.items()}
     gdf_puntos['PRIORIDAD_NUM'] = gdf_puntos['ACCION_TACTICA'].map(prio_map).fillna(7)
     
-    return gdf_puntos
+    # Estilo del mapa precalculado (la pestaña de fase 2 solo lo lee)
+    return columnas_estilo(gdf_puntos)
 
 u_fin = inyectar(u, gdf_data)
 r_fin = inyectar(r, gdf_data)
 
-u_fin.to_file("sits_urbano_fase2.geojson", driver='GeoJSON')
-r_fin.to_file("sits_rural_fase2.geojson", driver='GeoJSON')
+# Manzanas cuyo centroide no cae en ninguna sección quedan como SIN CLASIFICAR
+reporte.etapa("fase 2: asignación de sección")
+reporte.cobertura("urbano", "sección asignada", u_fin['SECCION'].notna())
+reporte.cobertura("rural", "sección asignada", r_fin['SECCION'].notna())
+reporte.verificar()
+
+guardar_capa(u_fin, "sits_urbano_fase2.geojson")
+guardar_capa(r_fin, "sits_rural_fase2.geojson")
 
+print(f"📋 Reporte de validación: {reporte.ruta}")
 print("✅ FASE 2 LISTA: Datos integrales (Sociales + Políticos) fusionados.")
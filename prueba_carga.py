@@ -0,0 +1,185 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import multiprocessing
+import numpy as np
+import pandas as pd
+import psutil
+from streamlit.testing.v1 import AppTest
+
+# ==========================================
+# PRUEBA DE CARGA: SESIONES CONCURRENTES DEL TABLERO
+# ==========================================
+# Cada sesión simulada es un AppTest (la API oficial de pruebas de Streamlit)
+# en su PROPIO PROCESO: AppTest instala y retira un Runtime global en cada run,
+# así que dos AppTest en hilos del mismo proceso se rompen entre sí.
+# Consecuencia: cada sesión tiene sus propias cachés (en el servidor real se
+# comparten), por lo que el primer uso de cada vista es frío en cada sesión y el
+# CPU/RSS reportado (suma del proceso y sus hijos) es una cota alta del servidor.
+# Las interacciones con error se cuentan aparte y no entran en las latencias.
+#
+# Uso: python prueba_carga.py --sesiones 10 --interacciones 20 --pausa 1.0
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+TIMEOUT_RERUN = 120
+
+# Guion de interacción: widget -> peso (qué tan seguido lo toca un analista)
+PESOS_INTERACCION = {
+    "sel_loc": 0.30,
+    "sel_ageb": 0.15,
+    "carencia": 0.30,
+    "stats.tipo_filtro": 0.15,
+    "pestaña": 0.10,
+}
+PERCENTILES = [50, 90, 95, 99]
+
+
+def _widget(at, clave):
+    """Busca el widget por su key (None si no se muestra en este rerun)."""
+    for tipo in (at.selectbox, at.radio):
+        try:
+            return tipo(key=clave)
+        except KeyError:
+            continue
+    return None
+
+
+def _interactuar(at, accion, rng):
+    """Ejecuta una acción. Devuelve False si no aplica (p.ej. sin AGEB en la zona)."""
+    if accion == "pestaña":
+        # Las pestañas usan on_change="rerun": cambiar de pestaña sí llega al
+        # servidor y solo se dibuja la pestaña abierta (stats.tipo_filtro solo
+        # existe en la de estadística)
+        actual = at.session_state["pestaña"] if "pestaña" in at.session_state else None
+        opciones = [t.label for t in at.tabs if t.label != actual]
+        if not opciones:
+            return False
+        at.session_state["pestaña"] = rng.choice(opciones)
+        at.run(timeout=TIMEOUT_RERUN)
+        return True
+    w = _widget(at, accion)
+    if w is None:
+        return False
+    opciones = [o for o in w.options if o != w.value] or list(w.options)
+    w.set_value(rng.choice(opciones)).run(timeout=TIMEOUT_RERUN)
+    return True
+
+
+def sesion(i, args):
+    """Una sesión completa (corre en un proceso hijo). Devuelve sus registros."""
+    registros = []
+    rng = random.Random(args.semilla + i)
+    acciones, pesos = zip(*PESOS_INTERACCION.items())
+    time.sleep(args.rampa * i)
+
+    at = AppTest.from_file(APP, default_timeout=TIMEOUT_RERUN)
+    t0 = time.perf_counter()
+    at.run()
+    fila = {"sesion": i, "accion": "carga_inicial", "seg": time.perf_counter() - t0, "error": len(at.exception) > 0}
+    registros.append(fila)
+
+    for _ in range(args.interacciones):
+        time.sleep(rng.uniform(0, 2 * args.pausa))
+        accion = rng.choices(acciones, weights=pesos)[0]
+        t0 = time.perf_counter()
+        try:
+            hubo_rerun = _interactuar(at, accion, rng)
+            error = len(at.exception) > 0
+        except Exception as e:
+            hubo_rerun, error = True, True
+            print(f"   ⚠️ sesión {i} / {accion}: {type(e).__name__}: {e}")
+        if hubo_rerun:
+            registros.append({"sesion": i, "accion": accion, "seg": time.perf_counter() - t0, "error": error})
+    return registros
+
+
+def monitor(muestras, alto, intervalo=0.5):
+    """CPU (% de un núcleo) y RSS sumados del proceso y sus sesiones hijas."""
+    raiz, vistos = psutil.Process(), {}
+    while not alto.is_set():
+        time.sleep(intervalo)
+        cpu = rss = 0.0
+        for proc in [raiz] + raiz.children(recursive=True):
+            # cpu_percent mide desde la llamada anterior: se reusa el mismo objeto
+            proc = vistos.setdefault(proc.pid, proc)
+            try:
+                cpu += proc.cpu_percent(None)
+                rss += proc.memory_info().rss
+            except psutil.NoSuchProcess:
+                continue
+        muestras.append({"t": time.time(), "cpu": cpu, "rss_mb": rss / 1e6})
+
+
+def reporte(registros, muestras, duracion):
+    df = pd.DataFrame(registros)
+    filas = []
+    for accion, g in df.groupby("accion"):
+        # Solo las interacciones correctas: un error corta el rerun y su tiempo no es latencia
+        ms = g.loc[~g["error"], "seg"].to_numpy() * 1000
+        fila = {"Interacción": accion, "N": len(ms), "Errores": int(g["error"].sum())}
+        for p in PERCENTILES:
+            fila[f"p{p} (ms)"] = float(np.percentile(ms, p)) if len(ms) else float("nan")
+        fila["máx (ms)"] = float(ms.max()) if len(ms) else float("nan")
+        filas.append(fila)
+    tabla = pd.DataFrame(filas).sort_values("Interacción")
+
+    cpu = np.array([m["cpu"] for m in muestras]) if muestras else np.zeros(1)
+    rss = np.array([m["rss_mb"] for m in muestras]) if muestras else np.zeros(1)
+    recursos = {
+        "duracion_s": duracion,
+        "reruns_por_s": int((~df["error"]).sum()) / duracion if duracion > 0 else 0,
+        "errores": int(df["error"].sum()),
+        "cpu_prom_pct": float(cpu.mean()), "cpu_max_pct": float(cpu.max()),
+        "rss_max_mb": float(rss.max()), "rss_final_mb": float(rss[-1]),
+        "nucleos": psutil.cpu_count(),
+    }
+    return tabla, recursos
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Prueba de carga del tablero SITS (sesiones concurrentes)")
+    ap.add_argument("--sesiones", type=int, default=10, help="Sesiones simultáneas")
+    ap.add_argument("--interacciones", type=int, default=15, help="Interacciones por sesión")
+    ap.add_argument("--pausa", type=float, default=1.0, help="Tiempo medio de lectura entre clics (s)")
+    ap.add_argument("--rampa", type=float, default=0.5, help="Segundos entre el arranque de cada sesión")
+    ap.add_argument("--semilla", type=int, default=2025)
+    ap.add_argument("--json", help="Guardar resultados en este archivo")
+    args = ap.parse_args(argv)
+
+    print(f"🚦 PRUEBA DE CARGA: {args.sesiones} sesiones x {args.interacciones} interacciones...")
+    muestras, alto = [], threading.Event()
+    hilo_mon = threading.Thread(target=monitor, args=(muestras, alto), daemon=True)
+    hilo_mon.start()
+
+    t0 = time.perf_counter()
+    # spawn: cada hijo arranca limpio (sin heredar hilos ni estado de Streamlit)
+    with multiprocessing.get_context("spawn").Pool(args.sesiones) as pool:
+        resultados = pool.starmap(sesion, [(i, args) for i in range(args.sesiones)])
+    registros = [r for regs in resultados for r in regs]
+    duracion = time.perf_counter() - t0
+    alto.set()
+    hilo_mon.join()
+
+    tabla, recursos = reporte(registros, muestras, duracion)
+    print("\n📊 LATENCIA POR INTERACCIÓN")
+    print(tabla.to_string(index=False, float_format=lambda v: f"{v:,.0f}"))
+    print("\n🖥️ RECURSOS (PROCESO + SESIONES)")
+    for k, v in recursos.items():
+        print(f"   {k}: {v:,.1f}" if isinstance(v, float) else f"   {k}: {v}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"parametros": vars(args), "latencias": tabla.to_dict("records"), "recursos": recursos}, f, ensure_ascii=False, indent=2)
+        print(f"\n✅ Resultados en {args.json}")
+
+    if recursos["errores"]:
+        print(f"\n⚠️ {recursos['errores']} interacciones con error (fuera de las latencias)")
+    return 1 if recursos["errores"] > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
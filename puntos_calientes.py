@@ -0,0 +1,191 @@
+import os
+import hashlib
+import numpy as np
+import pandas as pd
+import shapely
+from scipy import sparse
+
+from seleccion_espacial import CRS_METRICO
+
+# ==========================================
+# ANÁLISIS DE PUNTOS CALIENTES (Getis-Ord Gi* / LISA)
+# ==========================================
+# Pesos espaciales dispersos construidos con STRtree (sin comparar todos contra
+# todos), estadísticos locales con productos matriz-vector y p-values por
+# permutación condicional vectorizada por bloques.
+
+COLS_ANALISIS = ['SITS_INDEX', 'CAR_ALIM', 'CAR_SERV', 'CAR_VIV', 'CAR_SALUD', 'CAR_EDU']
+
+TOLERANCIA_M = 20      # Las manzanas están separadas por calles: vecinas si están a <= 20 m
+PERMUTACIONES = 999
+ALFA = 0.05
+SEMILLA = 12345
+LIMITE_BLOQUE = 2e7    # Elementos por bloque de permutaciones (controla la memoria)
+DIR_CACHE = "cache_pesos"
+
+COLORES_GI = {"Punto Caliente": "#b2182b", "Punto Frío": "#2166ac", "No Significativo": "#bdbdbd"}
+
+
+def construir_pesos(gdf, tolerancia=TOLERANCIA_M, dir_cache=DIR_CACHE):
+    """
+    Matriz binaria de vecindad (CSR). Dos polígonos son vecinos si están a menos
+    de 'tolerancia' metros; los que quedan aislados (localidades rurales) se
+    enlazan con su vecino más cercano. Se guarda en disco por huella de CVEGEO,
+    tolerancia y geometrías (WKB): editar los polígonos invalida el caché.
+    """
+    ids = gdf['CVEGEO'].astype(str).to_numpy()
+    h = hashlib.sha1(("|".join(ids) + f"|{tolerancia}").encode())
+    h.update(b"".join(shapely.to_wkb(np.asarray(gdf.geometry.values))))
+    huella = h.hexdigest()[:16]
+    archivo = os.path.join(dir_cache, f"pesos_{huella}.npz")
+    if os.path.exists(archivo):
+        return sparse.load_npz(archivo).tocsr()
+
+    geoms = shapely.make_valid(np.asarray(gdf.geometry.to_crs(CRS_METRICO).values))
+    n = len(geoms)
+    arbol = shapely.STRtree(geoms)
+    i, j = arbol.query(geoms, predicate='dwithin', distance=tolerancia)
+    distintos = i != j
+    i, j = i[distintos], j[distintos]
+
+    islas = np.flatnonzero(np.bincount(i, minlength=n) == 0)
+    if len(islas) and n > 1:
+        pos, jj = arbol.query_nearest(geoms[islas], exclusive=True)
+        ii = islas[pos]
+        i = np.concatenate([i, ii, jj])
+        j = np.concatenate([j, jj, ii])
+
+    W = sparse.csr_matrix((np.ones(len(i)), (i, j)), shape=(n, n))
+    W.sum_duplicates()
+    W.data[:] = 1.0
+
+    os.makedirs(dir_cache, exist_ok=True)
+    sparse.save_npz(archivo, W)
+    return W
+
+
+def _repetidos(idx):
+    o = np.sort(idx, axis=-1)
+    return (o[..., 1:] == o[..., :-1]).any(axis=-1)
+
+
+def _sin_reemplazo(f, n, permutaciones, k, rng):
+    """
+    (len(f), permutaciones, k) índices distintos en 0..n-1 sin el propio f.
+    Con k² <= n los choques son raros: se sortea con reemplazo y solo se
+    repiten las muestras con índices duplicados (queda uniforme). Con pocos
+    valores se baraja: los k menores de claves aleatorias.
+    """
+    if k * k > n:
+        idx = np.argpartition(rng.random((len(f), permutaciones, n - 1)), k - 1, axis=2)[..., :k]
+    else:
+        idx = rng.integers(0, n - 1, size=(len(f), permutaciones, k))
+        rep = _repetidos(idx)
+        while rep.any():
+            idx[rep] = rng.integers(0, n - 1, size=(int(rep.sum()), k))
+            rep[rep] = _repetidos(idx[rep])
+    idx += idx >= f[:, None, None]  # Excluye al propio i
+    return idx
+
+
+def _pseudo_p(x, suma_vecinos, card, permutaciones, rng):
+    """
+    Permutación condicional: para cada i se sortean 'card[i]' vecinos SIN
+    reemplazo entre los demás n-1 valores. Se procesa por grupos de igual
+    cardinalidad y en bloques para no crear la matriz completa
+    (n x permutaciones x k) de una vez.
+    """
+    n = len(x)
+    mayores, menores = np.zeros(n), np.zeros(n)
+    for k in np.unique(card[card > 0]):
+        filas = np.flatnonzero(card == k)
+        ancho = n - 1 if k * k > n else k
+        bloque = max(1, int(LIMITE_BLOQUE // (permutaciones * ancho)))
+        for a in range(0, len(filas), bloque):
+            f = filas[a:a + bloque]
+            idx = _sin_reemplazo(f, n, permutaciones, k, rng)
+            sims = x[idx].sum(axis=2)
+            mayores[f] = (sims >= suma_vecinos[f, None]).sum(axis=1)
+            menores[f] = (sims <= suma_vecinos[f, None]).sum(axis=1)
+    # Los empates cuentan de los dos lados: una suma igual a todas las simuladas
+    # (p.ej. vecinos todos en 0 en una variable casi siempre 0) no es significativa
+    p = (np.minimum(mayores, menores) + 1) / (permutaciones + 1)
+    p[card == 0] = 1.0
+    return p
+
+
+def estadisticos_locales(W, x, permutaciones=PERMUTACIONES, alfa=ALFA, semilla=SEMILLA):
+    """Gi* (z-score), LISA (I local + cuadrante) y p-value por permutación."""
+    n = len(x)
+    x = np.asarray(x, dtype=np.float64)
+    card = np.diff(W.indptr)
+    media = x.mean()
+    s = x.std()
+
+    res = pd.DataFrame(index=range(n))
+    if n < 3 or s == 0:
+        res['GI_Z'] = 0.0
+        res['LISA_I'] = 0.0
+        res['P'] = 1.0
+        res['GI_CLASE'] = "No Significativo"
+        res['LISA_CLASE'] = "No Significativo"
+        return res
+
+    # Gi*: incluye al propio i en la suma (pesos binarios -> sum w^2 = sum w)
+    suma_vecinos = W @ x
+    k = card + 1.0
+    lag_estrella = suma_vecinos + x
+    den = s * np.sqrt((n * k - k ** 2) / (n - 1))
+    gi_z = np.divide(lag_estrella - media * k, den, out=np.zeros(n), where=den > 0)
+
+    # LISA con pesos estandarizados por fila
+    z = (x - media) / s
+    lag_z = np.divide(W @ z, card, out=np.zeros(n), where=card > 0)
+    lisa_i = z * lag_z
+
+    # Con i fijo, ambos estadísticos son monótonos en la suma de los vecinos:
+    # una sola batería de permutaciones sirve para los dos
+    p = _pseudo_p(x, suma_vecinos, card, permutaciones, np.random.default_rng(semilla))
+    sig = p < alfa
+
+    res['GI_Z'] = gi_z
+    res['LISA_I'] = lisa_i
+    res['P'] = p
+    res['GI_CLASE'] = np.select([sig & (gi_z > 0), sig & (gi_z < 0)], ["Punto Caliente", "Punto Frío"], "No Significativo")
+    res['LISA_CLASE'] = np.select(
+        [sig & (z > 0) & (lag_z > 0), sig & (z < 0) & (lag_z < 0), sig & (z > 0) & (lag_z < 0), sig & (z < 0) & (lag_z > 0)],
+        ["Alto-Alto", "Bajo-Bajo", "Alto-Bajo", "Bajo-Alto"], "No Significativo"
+    )
+    return res
+
+
+def analizar(gdf, columnas=COLS_ANALISIS, permutaciones=PERMUTACIONES, tolerancia=TOLERANCIA_M):
+    """Corre Gi*/LISA para cada columna. Devuelve un DataFrame indexado por CVEGEO."""
+    gdf = gdf.reset_index(drop=True)
+    W = construir_pesos(gdf, tolerancia)
+    salida = pd.DataFrame(index=gdf['CVEGEO'].astype(str))
+    for c in columnas:
+        if c not in gdf.columns: continue
+        x = pd.to_numeric(gdf[c], errors='coerce').fillna(0).to_numpy()
+        res = estadisticos_locales(W, x, permutaciones)
+        for campo in res.columns:
+            salida[f'{campo}_{c}'] = res[campo].to_numpy()
+    return salida
+
+
+if __name__ == "__main__":
+    from topologia import leer_capa
+
+    print("🔥 ANÁLISIS DE PUNTOS CALIENTES (Gi* / LISA)...")
+    u = leer_capa("sits_urbano_oficial.geojson")
+    r = leer_capa("sits_rural_oficial.geojson")
+    base = pd.concat([u, r], ignore_index=True)
+
+    resultado = analizar(base)
+    resultado.to_csv("sits_puntos_calientes.csv")
+
+    for c in COLS_ANALISIS:
+        if f'GI_CLASE_{c}' in resultado.columns:
+            conteo = resultado[f'GI_CLASE_{c}'].value_counts().to_dict()
+            print(f"   -> {c}: {conteo}")
+    print("✅ LISTO: sits_puntos_calientes.csv")
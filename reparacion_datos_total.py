@@ -1,19 +1,29 @@
 import pandas as pd
-import geopandas as gpd
 import os
 import warnings
+from topologia import guardar_capa, leer_capa, ruta_topojson
+from almacen import exportar_parquet, leer_censo
+from indicadores import evaluar, leer_columnas, TASAS_2020, INDICADORES_25
+from validacion import Reporte
 
 warnings.filterwarnings('ignore')
 
 print("🚨 INICIANDO REPARACIÓN DE DATOS - VERSIÓN FINAL (2020 + 2025) 🚨")
 print("-----------------------------------------------------------------------")
 
+# Validación después de cada paso: se detiene antes de guardar capas malas
+reporte = Reporte("reparacion_datos_total")
+u_final = None
+
 # ARCHIVOS
 F_GEO_U = "sits_urbano_oficial.geojson"
 F_GEO_R = "sits_rural_oficial.geojson"
 F_CENSO_U = "conjunto_de_datos_ageb_urbana_30_cpv2020.csv"
 F_CENSO_R = "iter_veracruz_2020.csv"
 
+# Conteos crudos de vivienda que se conservan para el simulador de escenarios (app.py)
+COLS_CONTEO_VIV = ['TVIVPARHAB', 'VPH_PISOTIERRA', 'VPH_NODREN', 'VPH_S_ELEC', 'VPH_S_REFRI']
+
 def limpiar_cols(df):
     """Limpia columnas numéricas quitando asteriscos y N/A"""
     cols_necesarias = [
@@ -29,35 +39,12 @@ def limpiar_cols(df):
     return df
 
 def calcular_indicadores(df):
-    """Calcula los indicadores 2020 si no existen"""
+    """Calcula los indicadores 2020 (motor de indicadores.py) y los conteos de vivienda"""
     df = limpiar_cols(df)
-    
-    # Evitar div/0
-    df['POBTOT'] = df['POBTOT'].replace(0, 1)
-    df['TVIVPARHAB'] = df['TVIVPARHAB'].replace(0, 1)
-    df['P_15YMAS'] = df['P_15YMAS'].replace(0, 1)
-    
-    # Crear variables faltantes (Proxy)
-    if 'VPH_NODREN' not in df.columns:
-        if 'VPH_DRENAJ' in df.columns:
-            df['VPH_NODREN'] = (df['TVIVPARHAB'] - df['VPH_DRENAJ']).clip(lower=0)
-        else:
-            df['VPH_NODREN'] = 0
-         
-    if 'VPH_S_REFRI' not in df.columns:
-        if 'VPH_REFRI' in df.columns:
-            df['VPH_S_REFRI'] = (df['TVIVPARHAB'] - df['VPH_REFRI']).clip(lower=0)
-        else:
-            df['VPH_S_REFRI'] = 0
-
-    # Indicadores
-    df['CAR_EDU_20'] = ((df.get('P15YM_AN',0) + df.get('P15YM_SE',0)) / df['P_15YMAS']).clip(0,1)
-    df['CAR_SALUD_20'] = ((df['POBTOT'] - df.get('PDER_SS',0)) / df['POBTOT']).clip(0,1)
-    df['CAR_VIV_20'] = (df.get('VPH_PISOTIERRA',0) / df['TVIVPARHAB']).clip(0,1)
-    df['CAR_SERV_20'] = ((df.get('VPH_S_ELEC',0) + df['VPH_NODREN']) / (df['TVIVPARHAB']*2)).clip(0,1)
-    df['CAR_ALIM_20'] = (df['VPH_S_REFRI'] / df['TVIVPARHAB']).clip(0,1)
-    
-    return df
+    # Los conteos faltantes (drenaje, refrigerador, piso) se derivan en el motor
+    conteos = leer_columnas(df, COLS_CONTEO_VIV)
+    tasas = evaluar(df, TASAS_2020)
+    return df.assign(**conteos, **tasas)
 
 def limpiar_geojson_antes_de_cruce(gdf):
     """Elimina columnas viejas del GeoJSON para evitar conflictos."""
@@ -76,25 +63,11 @@ def generar_proyecciones_2025(gdf):
     """
     print("   🔮 Generando proyecciones 2025 y SITS_INDEX...")
     
-    # 1. Proyección de Carencias (Simulamos mejora del 5%)
-    vars_rez = ['CAR_ALIM', 'CAR_SERV', 'CAR_VIV', 'CAR_SALUD', 'CAR_EDU']
-    
-    for v in vars_rez:
-        col_20 = v + "_20"
-        # Si la columna 2020 existe (que debería, tras el cruce)
-        if col_20 in gdf.columns:
-            gdf[v] = gdf[col_20] * 0.95  # Mejora ligera
-        else:
-            gdf[v] = 0.0
-
-    # 2. SITS_INDEX (Promedio de carencias 2025)
-    # Índice multidimensional simple
-    gdf['SITS_INDEX'] = (
-        gdf['CAR_ALIM'] + gdf['CAR_SERV'] + gdf['CAR_VIV'] + 
-        gdf['CAR_SALUD'] + gdf['CAR_EDU']
-    ) / 5.0
+    # 1. Carencias 2025 (mejora del 5%) y SITS_INDEX (promedio de carencias 2025)
+    # desde las tasas 2020 del cruce; misma definición que el resto del proyecto
+    gdf = gdf.assign(**evaluar(gdf, INDICADORES_25))
 
-    # 3. Proyección de Población (Crecimiento 5% quinquenal aprox)
+    # 2. Proyección de Población (Crecimiento 5% quinquenal aprox)
     mapa_pob = {
         'POBTOT': 'POBTOT_25',
         'POB_FEM': 'POB_FEM_25',
@@ -124,12 +97,18 @@ def generar_proyecciones_2025(gdf):
 # 1. REPARACIÓN URBANA
 # ==========================================
 print("\n🏙️  ANALIZANDO ZONA URBANA...")
-if os.path.exists(F_GEO_U) and os.path.exists(F_CENSO_U):
-    gdf = gpd.read_file(F_GEO_U)
+if (os.path.exists(F_GEO_U) or os.path.exists(ruta_topojson(F_GEO_U))) and os.path.exists(F_CENSO_U):
+    gdf = leer_capa(F_GEO_U)
     gdf = limpiar_geojson_antes_de_cruce(gdf)
+
+    reporte.etapa("urbano: marco geográfico")
+    gdf = reporte.geometrias("urbano", gdf)
+    reporte.claves("urbano", gdf['CVEGEO'], largo=16, prefijo='30032')
+    reporte.traslapes("urbano", gdf)
+    reporte.huecos("urbano", gdf)
+    reporte.verificar()
     
-    df = pd.read_csv(F_CENSO_U, dtype=str, encoding='utf-8')
-    df = df[(df['ENTIDAD'] == '30') & (df['MUN'] == '032')]
+    df = leer_censo(F_CENSO_U, '30', ['032'])
 
     # --- CORRECCIÓN DE NOMBRES DE COLUMNA ---
     df.rename(columns={
@@ -152,16 +131,16 @@ if os.path.exists(F_GEO_U) and os.path.exists(F_CENSO_U):
     df = calcular_indicadores(df)
     
     cols_data = ['CAR_EDU_20', 'CAR_SALUD_20', 'CAR_VIV_20', 'CAR_SERV_20', 'CAR_ALIM_20', 
-                 'POBTOT', 'POB_FEM', 'POB_MAS', 'P_HLI', 'POB_AFRO', 'PCON_DISC']
+                 'POBTOT', 'POB_FEM', 'POB_MAS', 'P_HLI', 'POB_AFRO', 'PCON_DISC'] + COLS_CONTEO_VIV
     
     df = limpiar_cols(df) 
 
     print("   -> Intentando cruce exacto por Manzana...")
     df_to_merge = df[['KEY_MZA'] + cols_data]
-    
-    merge_mza = gdf.merge(df_to_merge, left_on='CVEGEO', right_on='KEY_MZA', how='left')
-    
-    tasa_exito = merge_mza['POBTOT'].notna().mean()
+
+    # Cobertura medida sobre las llaves (sin merge de prueba); el AGEB es el plan B
+    reporte.etapa("urbano: cruce con el censo")
+    tasa_exito = reporte.cruce("urbano", "manzana", gdf['CVEGEO'], df_to_merge['KEY_MZA'], minimo=None)
     print(f"   -> Tasa de éxito Manzana: {tasa_exito:.1%}")
     
     if tasa_exito < 0.5:
@@ -169,6 +148,8 @@ if os.path.exists(F_GEO_U) and os.path.exists(F_CENSO_U):
         df_ageb = df[df['MZA'] == '000'].copy()
         gdf['TEMP_AGEB_KEY'] = gdf['CVEGEO'].str.slice(0, 13)
         df_to_merge_ageb = df_ageb[['KEY_AGEB'] + cols_data]
+        reporte.cruce("urbano", "ageb (respaldo)", gdf['TEMP_AGEB_KEY'], df_to_merge_ageb['KEY_AGEB'])
+        reporte.verificar()
         
         gdf_final = gdf.merge(df_to_merge_ageb, left_on='TEMP_AGEB_KEY', right_on='KEY_AGEB', how='left')
         
@@ -181,10 +162,14 @@ if os.path.exists(F_GEO_U) and os.path.exists(F_CENSO_U):
         gdf_final = generar_proyecciones_2025(gdf_final)
         # ------------------------------------------
 
-        gdf_final.to_file(F_GEO_U, driver='GeoJSON')
+        guardar_capa(gdf_final, F_GEO_U)
+        exportar_parquet(gdf_final, "urbano")
+        u_final = gdf_final
         print("   ✅ Urbano (AGEB) guardado con éxito.")
         
     else:
+        reporte.verificar()
+        merge_mza = gdf.merge(df_to_merge, left_on='CVEGEO', right_on='KEY_MZA', how='left')
         cols_drop = ['KEY_MZA']
         merge_mza = merge_mza.drop(columns=[c for c in cols_drop if c in merge_mza.columns])
         for c in cols_data: merge_mza[c] = merge_mza[c].fillna(0)
@@ -193,20 +178,31 @@ if os.path.exists(F_GEO_U) and os.path.exists(F_CENSO_U):
         merge_mza = generar_proyecciones_2025(merge_mza)
         # ------------------------------------------
 
-        merge_mza.to_file(F_GEO_U, driver='GeoJSON')
+        guardar_capa(merge_mza, F_GEO_U)
+        exportar_parquet(merge_mza, "urbano")
+        u_final = merge_mza
         print("   ✅ Urbano (Manzana) guardado con éxito.")
 
 # ==========================================
 # 2. REPARACIÓN RURAL
 # ==========================================
 print("\n🚜  ANALIZANDO ZONA RURAL...")
-if os.path.exists(F_GEO_R) and os.path.exists(F_CENSO_R):
-    gdf = gpd.read_file(F_GEO_R)
+if (os.path.exists(F_GEO_R) or os.path.exists(ruta_topojson(F_GEO_R))) and os.path.exists(F_CENSO_R):
+    gdf = leer_capa(F_GEO_R)
     gdf = limpiar_geojson_antes_de_cruce(gdf)
+
+    # Localidades rurales encimadas a las manzanas contarían dos veces a la población
+    if u_final is None and (os.path.exists(F_GEO_U) or os.path.exists(ruta_topojson(F_GEO_U))):
+        u_final = leer_capa(F_GEO_U)
+    reporte.etapa("rural: marco geográfico")
+    gdf = reporte.geometrias("rural", gdf)
+    reporte.claves("rural", gdf['CVEGEO'], largo=9, prefijo='30032')
+    reporte.traslapes("rural", gdf)
+    if u_final is not None:
+        reporte.traslapes("rural", gdf, otra=u_final, capa_otra="urbano")
+    reporte.verificar()
     
-    df = pd.read_csv(F_CENSO_R, dtype=str)
-    df = df[df['ENTIDAD'].astype(int) == 30]
-    df = df[df['MUN'].astype(int) == 32]
+    df = leer_censo(F_CENSO_R, '30', ['32', '032'])
     
     df.rename(columns={
         'POBFEM': 'POB_FEM', 
@@ -222,9 +218,13 @@ if os.path.exists(F_GEO_R) and os.path.exists(F_CENSO_R):
     df = limpiar_cols(df)
     
     cols_data = ['CAR_EDU_20', 'CAR_SALUD_20', 'CAR_VIV_20', 'CAR_SERV_20', 'CAR_ALIM_20', 
-                 'POBTOT', 'POB_FEM', 'POB_MAS', 'P_HLI', 'POB_AFRO', 'PCON_DISC']
+                 'POBTOT', 'POB_FEM', 'POB_MAS', 'P_HLI', 'POB_AFRO', 'PCON_DISC'] + COLS_CONTEO_VIV
     
     df_to_merge = df[['KEY_LOC'] + cols_data]
+
+    reporte.etapa("rural: cruce con el censo")
+    reporte.cruce("rural", "localidad", gdf['CVEGEO'], df_to_merge['KEY_LOC'])
+    reporte.verificar()
     
     gdf_final = gdf.merge(df_to_merge, left_on='CVEGEO', right_on='KEY_LOC', how='left')
     
@@ -235,8 +235,10 @@ if os.path.exists(F_GEO_R) and os.path.exists(F_CENSO_R):
     gdf_final = generar_proyecciones_2025(gdf_final)
     # ------------------------------------------
 
-    gdf_final.to_file(F_GEO_R, driver='GeoJSON')
+    guardar_capa(gdf_final, F_GEO_R)
+    exportar_parquet(gdf_final, "rural")
     print("   ✅ Rural actualizado con éxito.")
 
+print(f"\n📋 Reporte de validación: {reporte.ruta}")
 print("\n-----------------------------------------------------")
 print("🏁 LISTO. EJECUTA 'streamlit run app.py'")
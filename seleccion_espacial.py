@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+from shapely.geometry import shape
+
+# ==========================================
+# SELECCIÓN ESPACIAL (POLÍGONO / RADIO DIBUJADO EN EL MAPA)
+# ==========================================
+# Índice STRtree sobre las geometrías SITS en coordenadas proyectadas (metros).
+# La consulta devuelve solo los candidatos cuyo rectángulo toca la figura y las
+# intersecciones se calculan vectorizadas con shapely 2.
+
+CRS_METRICO = "EPSG:6372"  # México ITRF2008 / LCC (áreas y distancias en metros)
+
+# Columnas de conteo que se suman ponderadas por el área cubierta
+COLS_SUMA = [
+    'POBTOT_25', 'POB_FEM_25', 'POB_MAS_25', 'POB_NINOS_25', 'POB_MAYORES_25',
+    'HOGARES_JEFAS_25', 'POB_AFRO_25', 'POB_INDIGENA_25', 'POB_DISC_25'
+]
+COLS_CARENCIA = ['SITS_INDEX', 'CAR_ALIM', 'CAR_SERV', 'CAR_VIV', 'CAR_SALUD', 'CAR_EDU']
+
+
+def construir_indice(gdf):
+    """Proyecta las geometrías y arma el STRtree (se construye una vez y se cachea)."""
+    gdf = gdf.reset_index(drop=True)
+    geoms = gdf.geometry.to_crs(CRS_METRICO).values
+    geoms = shapely.make_valid(np.asarray(geoms))
+
+    atributos = pd.DataFrame({'CVEGEO': gdf['CVEGEO'].astype(str), 'NOM_LOC': gdf['NOM_LOC'].astype(str), 'TIPO': gdf.get('TIPO', 'Urbano')})
+    if 'CVE_AGEB' in gdf.columns:
+        atributos['CVE_AGEB'] = gdf['CVE_AGEB'].fillna('')
+    for c in COLS_SUMA + COLS_CARENCIA:
+        atributos[c] = pd.to_numeric(gdf[c], errors='coerce').fillna(0) if c in gdf.columns else 0.0
+
+    return {
+        'arbol': shapely.STRtree(geoms),
+        'geoms': geoms,
+        'areas': shapely.area(geoms),
+        'atributos': atributos,
+    }
+
+
+def geometria_dibujo(dibujo):
+    """
+    Convierte la figura que devuelve st_folium (GeoJSON en WGS84) a una geometría
+    en metros. Los círculos llegan como Point + properties.radius.
+    """
+    if not dibujo or not dibujo.get('geometry'):
+        return None
+    geom = gpd.GeoSeries([shape(dibujo['geometry'])], crs="EPSG:4326").to_crs(CRS_METRICO).iloc[0]
+    radio = (dibujo.get('properties') or {}).get('radius')
+    if geom.geom_type == 'Point':
+        if not radio:
+            return None
+        geom = geom.buffer(float(radio))
+    return geom if geom.area > 0 else None
+
+
+def agregar(indice, geom):
+    """
+    Filas tocadas por la figura con su fracción de área cubierta y los conteos
+    ponderados (población y afectados por carencia).
+    """
+    idx = indice['arbol'].query(geom, predicate='intersects')
+    if len(idx) == 0:
+        return pd.DataFrame(columns=list(indice['atributos'].columns) + ['FRACCION'])
+
+    areas = indice['areas'][idx]
+    cubierta = shapely.area(shapely.intersection(indice['geoms'][idx], geom))
+    fraccion = np.divide(cubierta, areas, out=np.ones_like(areas), where=areas > 0).clip(0, 1)
+
+    sel = indice['atributos'].iloc[idx].copy()
+    sel['FRACCION'] = fraccion
+    for c in COLS_SUMA:
+        sel[c] = sel[c] * fraccion
+    for c in COLS_CARENCIA:
+        sel[f'AFEC_{c}'] = sel[c] * sel['POBTOT_25']
+    return sel
+
+
+def totales(sel):
+    """Resumen estilo 'tab_stats': totales de la selección y afectados por carencia."""
+    if sel.empty:
+        return {}
+    res = {c: float(sel[c].sum()) for c in COLS_SUMA}
+    for c in COLS_CARENCIA:
+        res[f'AFEC_{c}'] = float(sel[f'AFEC_{c}'].sum())
+    res['N_MANZANAS'] = int((sel['TIPO'] == 'Urbano').sum())
+    res['N_LOCALIDADES'] = int(sel['NOM_LOC'].nunique())
+    return res
@@ -0,0 +1,23 @@
+import os
+import sys
+from streamlit.web import cli
+
+import calentamiento
+
+# ==========================================
+# ARRANQUE DEL SERVIDOR CON CALENTAMIENTO
+# ==========================================
+# Uso: python servidor.py [opciones de 'streamlit run', p.ej. --server.port=8501]
+# El calentamiento empieza al arrancar el proceso (antes de la primera sesión)
+# y el estado de preparación queda en http://SITS_HOST_SALUD:SITS_PUERTO_SALUD/listo
+# (127.0.0.1 por omisión).
+
+if __name__ == "__main__":
+    print("🏛️ INICIANDO SERVIDOR SITS...")
+    calentamiento.iniciar(puerto_salud=int(os.environ.get("SITS_PUERTO_SALUD", "8502")))
+
+    # Las opciones pasan tal cual al CLI de streamlit, que las interpreta igual que
+    # 'streamlit run app.py ...' (--opcion valor, --opcion=valor, etc.)
+    app = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+    sys.argv = ["streamlit", "run", app] + sys.argv[1:]
+    sys.exit(cli.main())
@@ -0,0 +1,255 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+
+# ==========================================
+# SALIDA COMPACTA: TOPOJSON CUANTIZADO
+# ==========================================
+# Las manzanas vecinas comparten bordes: en GeoJSON cada borde se guarda dos
+# veces y con 15-17 dígitos por coordenada. Aquí las coordenadas se llevan a una
+# malla entera (cuantización), los bordes compartidos se guardan una sola vez
+# como "arcos" y cada arco se codifica con deltas enteros. Los atributos van en
+# el "properties" estándar de cada geometría (y la CVEGEO como "id"), así GDAL,
+# QGIS y geopandas leen la capa completa. Las capas viejas con el miembro
+# "columnas" (atributos por columna) se siguen leyendo.
+
+CUANTIZACION = 100000      # ~0.3 m de resolución para el municipio completo
+PRECISION_ATRIBUTOS = 6    # Decimales de los atributos numéricos (0.0001% en los indicadores)
+
+
+def ruta_topojson(ruta):
+    return os.path.splitext(ruta)[0] + ".topojson"
+
+
+def _anillos(geom):
+    """Lista de polígonos, cada uno como lista de anillos (exterior + huecos)."""
+    if geom is None or geom.is_empty:
+        return []
+    if geom.geom_type == 'Polygon':
+        polys = [geom]
+    elif geom.geom_type == 'MultiPolygon':
+        polys = list(geom.geoms)
+    else:
+        return []
+    return [[np.asarray(p.exterior.coords)] + [np.asarray(h.coords) for h in p.interiors] for p in polys]
+
+
+def _cuantizar(coords, x0, y0, kx, ky):
+    q = np.column_stack([np.round((coords[:, 0] - x0) / kx), np.round((coords[:, 1] - y0) / ky)]).astype(np.int64)
+    # Quitar puntos repetidos consecutivos que aparecen al redondear
+    distinto = np.ones(len(q), dtype=bool)
+    distinto[1:] = np.any(q[1:] != q[:-1], axis=1)
+    q = q[distinto]
+    if len(q) > 1 and (q[0] == q[-1]).all():
+        q = q[:-1]
+    return [tuple(p) for p in q.tolist()]
+
+
+def _rotar_min(pts):
+    i = pts.index(min(pts))
+    return pts[i:] + pts[:i]
+
+
+def codificar(gdf, nombre, cuantizacion=CUANTIZACION):
+    """Convierte un GeoDataFrame (EPSG:4326) en un diccionario TopoJSON."""
+    if gdf.crs is not None and gdf.crs != "EPSG:4326":
+        gdf = gdf.to_crs("EPSG:4326")
+
+    x0, y0, x1, y1 = gdf.total_bounds
+    kx = (x1 - x0) / (cuantizacion - 1) or 1.0
+    ky = (y1 - y0) / (cuantizacion - 1) or 1.0
+
+    # 1. Anillos cuantizados (cíclicos, sin repetir el punto de cierre)
+    formas = []
+    for geom in gdf.geometry:
+        polys = []
+        for anillos in _anillos(geom):
+            qs = [_cuantizar(a, x0, y0, kx, ky) for a in anillos]
+            if len(qs[0]) < 3: continue
+            polys.append([q for q in qs if len(q) >= 3])
+        formas.append(polys)
+
+    # 2. Uniones: puntos que aparecen con distintos vecinos en distintos anillos
+    visto, uniones = {}, set()
+    for polys in formas:
+        for anillos in polys:
+            for pts in anillos:
+                m = len(pts)
+                for i, p in enumerate(pts):
+                    a, b = pts[i - 1], pts[(i + 1) % m]
+                    par = (a, b) if a < b else (b, a)
+                    previo = visto.setdefault(p, par)
+                    if previo != par:
+                        uniones.add(p)
+
+    # 3. Cortar anillos en arcos y deduplicar los compartidos
+    arcos, indice = [], {}
+
+    def registrar(seg, cerrado=False):
+        clave = tuple(seg)
+        if clave in indice: return indice[clave]
+        inv = list(reversed(seg))
+        if cerrado:
+            inv = _rotar_min(inv[:-1])
+            inv.append(inv[0])
+        if tuple(inv) in indice: return ~indice[tuple(inv)]
+        indice[clave] = len(arcos)
+        arcos.append(seg)
+        return indice[clave]
+
+    def arcos_anillo(pts):
+        cortes = [i for i, p in enumerate(pts) if p in uniones]
+        if not cortes:
+            r = _rotar_min(pts)
+            return [registrar(r + [r[0]], cerrado=True)]
+        pts = pts[cortes[0]:] + pts[:cortes[0]] + [pts[cortes[0]]]
+        cortes = [i for i, p in enumerate(pts) if p in uniones]
+        return [registrar(pts[a:b + 1]) for a, b in zip(cortes[:-1], cortes[1:])]
+
+    geometrias = []
+    for polys in formas:
+        arcos_polys = [[arcos_anillo(pts) for pts in anillos] for anillos in polys]
+        if not arcos_polys:
+            geometrias.append({"type": None})
+        elif len(arcos_polys) == 1:
+            geometrias.append({"type": "Polygon", "arcs": arcos_polys[0]})
+        else:
+            geometrias.append({"type": "MultiPolygon", "arcs": arcos_polys})
+
+    atributos = pd.DataFrame(gdf.drop(columns=gdf.geometry.name)).reset_index(drop=True)
+    registros = json.loads(atributos.to_json(orient='records', double_precision=PRECISION_ATRIBUTOS))
+    for g, props in zip(geometrias, registros):
+        g["properties"] = props
+        if props.get("CVEGEO") is not None:
+            g["id"] = props["CVEGEO"]
+
+    # 4. Arcos con deltas enteros (primer punto absoluto)
+    arcos_delta = []
+    for seg in arcos:
+        a = np.asarray(seg, dtype=np.int64)
+        arcos_delta.append(np.vstack([a[:1], np.diff(a, axis=0)]).tolist())
+
+    return {
+        "type": "Topology",
+        "bbox": [float(x0), float(y0), float(x1), float(y1)],
+        "transform": {"scale": [kx, ky], "translate": [float(x0), float(y0)]},
+        "objects": {nombre: {"type": "GeometryCollection", "geometries": geometrias}},
+        "arcs": arcos_delta,
+    }
+
+
+def _decodificar_arcos(topo):
+    """Todos los arcos de una vez: suma acumulada vectorizada y transformación."""
+    arcos = topo["arcs"]
+    if not arcos:
+        return []
+    largos = np.fromiter((len(a) for a in arcos), dtype=np.int64, count=len(arcos))
+    plano = np.fromiter((v for a in arcos for p in a for v in p), dtype=np.float64, count=int(largos.sum()) * 2).reshape(-1, 2)
+    inicios = np.concatenate([[0], np.cumsum(largos)[:-1]])
+    acum = np.cumsum(plano, axis=0)
+    previo = np.vstack([[0.0, 0.0], acum[inicios[1:] - 1]])
+    abs_ = acum - np.repeat(previo, largos, axis=0)
+    t = topo.get("transform")
+    if t:
+        abs_ = abs_ * np.asarray(t["scale"]) + np.asarray(t["translate"])
+    return np.split(abs_, inicios[1:])
+
+
+def _anillo(ids, arcos):
+    partes = [arcos[i] if i >= 0 else arcos[~i][::-1] for i in ids]
+    return np.concatenate([partes[0]] + [p[1:] for p in partes[1:]])
+
+
+def _atributos(objeto):
+    if "columnas" in objeto:
+        return pd.DataFrame(objeto["columnas"])
+    return pd.DataFrame([g.get("properties") or {} for g in objeto["geometries"]])
+
+
+def atributos(topo, nombre=None):
+    """Solo la tabla de atributos de un objeto (sin reconstruir geometrías)."""
+    return _atributos(topo["objects"][nombre or next(iter(topo["objects"]))])
+
+
+def decodificar(topo, nombre=None):
+    """Convierte un TopoJSON (uno de sus objetos) en GeoDataFrame EPSG:4326."""
+    nombre = nombre or next(iter(topo["objects"]))
+    objeto = topo["objects"][nombre]
+    arcos = _decodificar_arcos(topo)
+    geoms = []
+    for g in objeto["geometries"]:
+        if g.get("type") == "Polygon":
+            anillos = [_anillo(ids, arcos) for ids in g["arcs"]]
+            geoms.append(shapely.Polygon(anillos[0], anillos[1:]))
+        elif g.get("type") == "MultiPolygon":
+            polys = [[_anillo(ids, arcos) for ids in p] for p in g["arcs"]]
+            geoms.append(shapely.MultiPolygon([shapely.Polygon(p[0], p[1:]) for p in polys]))
+        else:
+            geoms.append(None)
+    return gpd.GeoDataFrame(_atributos(objeto), geometry=geoms, crs="EPSG:4326")
+
+
+def subconjunto(topo, nombre, claves, campo='CVEGEO', campos=None):
+    """
+    TopoJSON estándar reducido para el navegador (folium): solo las geometrías
+    seleccionadas, solo los arcos que usan (reindexados) y, si se indica, solo
+    algunos atributos, escritos en 'properties' de cada geometría.
+    """
+    objeto = topo["objects"][nombre]
+    atributos = _atributos(objeto)
+    if campos is not None:
+        atributos = atributos[[c for c in atributos.columns if c in campos]]
+    filas = np.flatnonzero(atributos[campo].isin(set(claves)).to_numpy()) if campo in atributos.columns else np.arange(0)
+    sel = atributos.iloc[filas].astype(object)
+    registros = sel.where(sel.notna(), None).to_dict('records')
+    geoms = [objeto["geometries"][i] for i in filas]
+
+    usados = {}
+    def remap(i):
+        j = i if i >= 0 else ~i
+        if j not in usados: usados[j] = len(usados)
+        return usados[j] if i >= 0 else ~usados[j]
+
+    nuevas = []
+    for g, props in zip(geoms, registros):
+        n = {"type": g["type"], "properties": props}
+        if g["type"] == "Polygon":
+            n["arcs"] = [[remap(i) for i in anillo] for anillo in g["arcs"]]
+        elif g["type"] == "MultiPolygon":
+            n["arcs"] = [[[remap(i) for i in anillo] for anillo in p] for p in g["arcs"]]
+        nuevas.append(n)
+
+    arcos = [None] * len(usados)
+    for j, k in usados.items():
+        arcos[k] = topo["arcs"][j]
+    return {**topo, "objects": {nombre: {"type": "GeometryCollection", "geometries": nuevas}}, "arcs": arcos}
+
+
+def guardar_capa(gdf, ruta, nombre=None):
+    """Escribe la capa como TopoJSON junto a la ruta .geojson indicada."""
+    destino = ruta_topojson(ruta)
+    nombre = nombre or os.path.splitext(os.path.basename(ruta))[0]
+    with open(destino, "w", encoding="utf-8") as f:
+        json.dump(codificar(gdf, nombre), f, ensure_ascii=False, separators=(",", ":"))
+    return destino
+
+
+def leer_json(ruta):
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def leer_topojson(ruta):
+    topo = leer_json(ruta)
+    return topo, decodificar(topo)
+
+
+def leer_capa(ruta):
+    """Lee la versión TopoJSON si existe; si no, el GeoJSON original."""
+    destino = ruta_topojson(ruta)
+    if os.path.exists(destino):
+        return leer_topojson(destino)[1]
+    return gpd.read_file(ruta)
@@ -0,0 +1,265 @@
+import os
+import json
+import time
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+
+from seleccion_espacial import CRS_METRICO
+
+# ==========================================
+# VALIDACIÓN Y REPARACIÓN DEL PIPELINE
+# ==========================================
+# Chequeos rápidos que los scripts de preparación corren después de cada paso:
+# cobertura de llaves por cruce (vectorizada con índices hash, sin merge de
+# prueba), CVEGEO faltantes o mal formadas, geometrías inválidas (se reparan con
+# make_valid) y traslapes/huecos con un STRtree: solo se comparan los pares
+# cuyos rectángulos se tocan, nunca todos contra todos. Cada verificar() escribe
+# el reporte JSON y, en modo estricto, detiene el script en el primer paso con
+# errores, antes de guardar capas malas.
+#
+# SITS_VALIDACION=aviso  -> registra los errores pero no detiene el script
+
+DIR_REPORTES = "reportes_validacion"
+ESTRICTA = os.environ.get("SITS_VALIDACION", "estricta").lower() != "aviso"
+
+COBERTURA_MINIMA = 0.5   # Fracción mínima de filas con pareja en un cruce
+TOLERANCIA_AREA = 1.0    # m²: traslapes menores son ruido de digitalización
+TOLERANCIA_HUECO = 0.5   # m: vecinos más cerca que esto sin tocarse = hueco (astilla)
+FRACCION_DUPLICADA = 0.5 # Polígono cubierto en más de esta fracción por otro = doble conteo
+MUESTRA = 10             # Ejemplos por chequeo en el reporte
+
+ICONOS = {"ok": "✅", "aviso": "⚠️", "error": "❌"}
+
+
+class ValidacionFallida(Exception):
+    """Algún chequeo dio error en modo estricto (el detalle está en el reporte JSON)."""
+
+    def __init__(self, etapa, errores, ruta):
+        self.etapa, self.errores, self.ruta = etapa, errores, ruta
+        super().__init__(f"Validación fallida en '{etapa}': {len(errores)} error(es). Ver {ruta}")
+
+
+def _valor(v):
+    """Escalar de numpy -> tipo de Python (para el JSON)."""
+    return v.item() if isinstance(v, np.generic) else v
+
+
+def _muestra(valores):
+    return [_valor(v) for v in list(valores)[:MUESTRA]]
+
+
+def _ids(gdf):
+    """Identificador legible para los ejemplos del reporte."""
+    for c in ['CVEGEO', 'SECCION']:
+        if c in gdf.columns:
+            return gdf[c].to_numpy()
+    return np.arange(len(gdf))
+
+
+def _metricas(gdf):
+    """Geometrías en metros como arreglo de shapely."""
+    return np.asarray(gdf.geometry.to_crs(CRS_METRICO).values)
+
+
+class Reporte:
+    """Resultados de los chequeos de un script; se reescribe en disco en cada verificar()."""
+
+    def __init__(self, script, estricta=ESTRICTA, directorio=DIR_REPORTES):
+        self.ruta = os.path.join(directorio, f"{script}.json")
+        self.estricta = estricta
+        self.etapa_actual = None
+        self.datos = {"script": script, "inicio": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                      "estricta": estricta, "estado": "ok", "chequeos": []}
+
+    def etapa(self, nombre):
+        self.etapa_actual = nombre
+        print(f"   🔎 Validando: {nombre}")
+        return self
+
+    def _registrar(self, capa, chequeo, estado, mensaje, t0, **metricas):
+        self.datos["chequeos"].append({
+            "etapa": self.etapa_actual, "capa": capa, "chequeo": chequeo, "estado": estado,
+            "mensaje": mensaje, "ms": round((time.perf_counter() - t0) * 1000, 1), **metricas,
+        })
+        if estado != "ok":
+            print(f"      {ICONOS[estado]} [{capa}] {chequeo}: {mensaje}")
+
+    # --- LLAVES ---
+
+    def cobertura(self, capa, chequeo, encontradas, minimo=COBERTURA_MINIMA, t0=None, **metricas):
+        """
+        Registra la fracción de filas con pareja. Error si queda bajo 'minimo'
+        (None = solo informativo: el script tiene un plan B).
+        """
+        t0 = t0 or time.perf_counter()
+        encontradas = np.asarray(encontradas, dtype=bool)
+        tasa = float(encontradas.mean()) if len(encontradas) else 0.0
+        if minimo is not None and tasa < minimo:
+            estado, mensaje = "error", f"cobertura {tasa:.1%} < {minimo:.0%}"
+        elif tasa < 1:
+            estado, mensaje = "aviso", f"cobertura {tasa:.1%} ({(~encontradas).sum():,} filas sin pareja)"
+        else:
+            estado, mensaje = "ok", "cobertura 100%"
+        self._registrar(capa, chequeo, estado, mensaje, t0, cobertura=tasa, filas=len(encontradas), **metricas)
+        return tasa
+
+    def cruce(self, capa, nombre, izquierda, derecha, minimo=COBERTURA_MINIMA):
+        """
+        Cobertura de un merge izquierda->derecha sin hacerlo: isin sobre índices
+        hash. También cuenta llaves repetidas a la derecha (multiplican filas) y a
+        la izquierda (un mismo dato se copia a varias geometrías). Devuelve la tasa.
+        """
+        t0 = time.perf_counter()
+        izq, der = pd.Index(izquierda), pd.Index(derecha)
+        encontradas = izq.isin(der)
+        dup_der = der[der.duplicated() & der.isin(izq)].unique()
+        metricas = {
+            "llaves_izquierda": len(izq), "llaves_derecha": len(der),
+            "cobertura_derecha": float(der.isin(izq).mean()) if len(der) else 0.0,
+            "nulas_izquierda": int(izq.isna().sum()),
+            "repetidas_derecha": len(dup_der),
+            "repetidas_izquierda": int(izq[encontradas].duplicated().sum()),
+            "sin_pareja": _muestra(izq[~encontradas].dropna().unique()),
+        }
+        tasa = self.cobertura(capa, f"cruce {nombre}", encontradas, minimo, t0, **metricas)
+        if len(dup_der):
+            self._registrar(capa, f"cruce {nombre}", "error",
+                            f"{len(dup_der):,} llaves repetidas a la derecha: el merge duplicaría filas",
+                            t0, ejemplos=_muestra(dup_der))
+        elif metricas["repetidas_izquierda"]:
+            self._registrar(capa, f"cruce {nombre}", "aviso",
+                            f"{metricas['repetidas_izquierda']:,} filas reciben el dato de otra "
+                            "(totales copiados: no sumar la población de esta capa)", t0)
+        return tasa
+
+    def claves(self, capa, cvegeo, largo=None, prefijo=None):
+        """CVEGEO nulas, vacías, repetidas, con otro largo o de otro municipio."""
+        t0 = time.perf_counter()
+        s = pd.Series(cvegeo).astype("string").str.strip()
+        problemas = {
+            "nulas": s.isna() | (s == ""),
+            "repetidas": s.duplicated(keep=False) & s.notna(),
+            "no_alfanumericas": ~s.str.fullmatch(r"[0-9A-Z]+", na=True),
+        }
+        if largo is not None:
+            problemas["largo_distinto"] = s.notna() & (s.str.len() != largo)
+        if prefijo is not None:
+            problemas["otro_municipio"] = s.notna() & ~s.str.startswith(prefijo, na=False)
+        conteos = {k: int(m.sum()) for k, m in problemas.items()}
+        malas = [k for k, n in conteos.items() if n]
+        mensaje = ", ".join(f"{conteos[k]:,} {k}" for k in malas) or "sin problemas"
+        self._registrar(capa, "CVEGEO", "error" if malas else "ok", mensaje, t0, filas=len(s), **conteos,
+                        ejemplos={k: _muestra(s[problemas[k]].fillna("<nula>").unique()) for k in malas})
+
+    # --- GEOMETRÍAS ---
+
+    def geometrias(self, capa, gdf):
+        """
+        Repara con make_valid (solo las inválidas, conservando únicamente la
+        parte poligonal) y devuelve la capa. Error si quedan nulas/vacías o
+        si alguna no tiene arreglo.
+        """
+        t0 = time.perf_counter()
+        geoms = np.asarray(gdf.geometry.values)
+        nulas = shapely.is_missing(geoms)
+        vacias = ~nulas & shapely.is_empty(geoms)
+        invalidas = ~nulas & ~vacias & ~shapely.is_valid(geoms)
+
+        if invalidas.any():
+            reparadas = shapely.make_valid(geoms[invalidas], method="structure", keep_collapsed=False)
+            geoms = geoms.copy()
+            geoms[invalidas] = reparadas
+            gdf = gdf.copy()
+            gdf[gdf.geometry.name] = gpd.GeoSeries(geoms, index=gdf.index, crs=gdf.crs)
+        sin_arreglo = invalidas & (~shapely.is_valid(geoms) | shapely.is_empty(geoms))
+
+        conteos = {"nulas": int(nulas.sum()), "vacias": int(vacias.sum()),
+                   "reparadas": int((invalidas & ~sin_arreglo).sum()), "sin_arreglo": int(sin_arreglo.sum())}
+        malas = nulas | vacias | sin_arreglo
+        if malas.any():
+            estado = "error"
+        else:
+            estado = "aviso" if invalidas.any() else "ok"
+        mensaje = ", ".join(f"{n:,} {k}" for k, n in conteos.items() if n) or "todas válidas"
+        ejemplos = _muestra(_ids(gdf)[malas | invalidas])
+        self._registrar(capa, "geometrías", estado, mensaje, t0, filas=len(gdf), **conteos, ejemplos=ejemplos)
+        return gdf
+
+    def traslapes(self, capa, gdf, otra=None, capa_otra=None):
+        """
+        Traslapes dentro de una capa (o de 'gdf' sobre 'otra', p.ej. rural sobre
+        urbano). El STRtree da los pares candidatos y el área de intersección se
+        calcula vectorizada. Un polígono cubierto en más de FRACCION_DUPLICADA
+        es doble conteo (error); traslapes menores son aviso.
+        """
+        t0 = time.perf_counter()
+        a = _metricas(gdf)
+        b = a if otra is None else _metricas(otra)
+        i, j = shapely.STRtree(b).query(a, predicate="intersects")
+        if otra is None:
+            i, j = i[i < j], j[i < j]
+        area = shapely.area(shapely.intersection(a[i], b[j]))
+        m = area > TOLERANCIA_AREA
+        i, j, area = i[m], j[m], area[m]
+
+        areas = shapely.area(a)
+        cubierta = np.bincount(i, weights=area, minlength=len(a))
+        if otra is None:
+            cubierta += np.bincount(j, weights=area, minlength=len(a))
+        fraccion = np.divide(cubierta, areas, out=np.zeros(len(a)), where=areas > 0)
+        duplicadas = fraccion > FRACCION_DUPLICADA
+
+        nombre = "traslapes" if otra is None else f"traslapes sobre {capa_otra}"
+        claves_a = _ids(gdf)
+        claves_b = claves_a if otra is None else _ids(otra)
+        orden = np.argsort(-area)[:MUESTRA]
+        if duplicadas.any():
+            estado, mensaje = "error", f"{duplicadas.sum():,} polígonos cubiertos >{FRACCION_DUPLICADA:.0%} (doble conteo)"
+        elif len(area):
+            estado, mensaje = "aviso", f"{len(area):,} pares con {area.sum():,.0f} m² traslapados"
+        else:
+            estado, mensaje = "ok", "sin traslapes"
+        self._registrar(capa, nombre, estado, mensaje, t0, pares=len(area), m2=float(area.sum()),
+                        duplicadas=int(duplicadas.sum()), candidatos_arbol=int(m.size),
+                        ejemplos=[[_valor(claves_a[i[k]]), _valor(claves_b[j[k]]), round(float(area[k]), 1)]
+                                  for k in orden])
+
+    def huecos(self, capa, gdf, tolerancia=TOLERANCIA_HUECO):
+        """
+        Huecos tipo astilla: vecinos a menos de 'tolerancia' metros que no se
+        tocan (bordes digitalizados por separado). Las calles quedan fuera: son
+        mucho más anchas que la tolerancia. Siempre es aviso.
+        """
+        t0 = time.perf_counter()
+        a = _metricas(gdf)
+        i, j = shapely.STRtree(a).query(a, predicate="dwithin", distance=tolerancia)
+        i, j = i[i < j], j[i < j]
+        d = shapely.distance(a[i], a[j])
+        m = d > 0
+        claves = _ids(gdf)
+        self._registrar(capa, "huecos", "aviso" if m.any() else "ok",
+                        f"{m.sum():,} pares separados por menos de {tolerancia} m" if m.any() else "sin huecos",
+                        t0, pares=int(m.sum()),
+                        ejemplos=[[_valor(claves[x]), _valor(claves[y]), round(float(z), 3)]
+                                  for x, y, z in zip(i[m][:MUESTRA], j[m][:MUESTRA], d[m][:MUESTRA])])
+
+    # --- CIERRE ---
+
+    def verificar(self):
+        """Escribe el reporte y, en modo estricto, se detiene si la etapa actual tuvo errores."""
+        errores = [c for c in self.datos["chequeos"] if c["estado"] == "error" and c["etapa"] == self.etapa_actual]
+        if errores:
+            self.datos["estado"] = "error"
+        elif self.datos["estado"] == "ok" and any(c["estado"] == "aviso" for c in self.datos["chequeos"]):
+            self.datos["estado"] = "aviso"
+        self.datos["fin"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+
+        os.makedirs(os.path.dirname(self.ruta) or ".", exist_ok=True)
+        with open(self.ruta, "w", encoding="utf-8") as f:
+            json.dump(self.datos, f, ensure_ascii=False, indent=1)
+
+        if errores and self.estricta:
+            raise ValidacionFallida(self.etapa_actual, errores, self.ruta)
+        return self